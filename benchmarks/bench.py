@@ -0,0 +1,204 @@
+"""End-to-end benchmarks of labelord against local fake GitHub API.
+
+    python benchmarks/bench.py --repos 2000 --labels 150 --jobs 8
+
+Each scenario reports wall time, number of requests received by the fake
+GitHub and throughput, so regressions are visible between revisions."""
+import os
+import sys
+import hmac
+import json
+import time
+import hashlib
+import tempfile
+import click
+import requests
+from click.testing import CliRunner
+
+ABS_PATH = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ABS_PATH, '..'))
+sys.path.insert(0, os.path.join(ABS_PATH, '..', 'tests_cli'))
+
+from fakegithub import FakeGitHub, FakeGitHubServer, ServerAdapter  # noqa
+from labelord import cli  # noqa
+
+OWNER = 'MarekSuchanek'
+SECRET = 'S3cret!'
+
+
+def repo_names(count):
+    return ['{}/repo{:05}'.format(OWNER, i) for i in range(count)]
+
+
+def spec_labels(count):
+    return {'label{:03}'.format(i): '{:06X}'.format(i) for i in range(count)}
+
+
+def setup_fake(fake, repos, labels):
+    """Fill fake with repos, each having labels of which every tenth has
+    different color and every twentieth is missing."""
+    for repo in repo_names(repos):
+        fake.add_repo(repo, [
+            (name, '000000' if i % 10 == 0 else color)
+            for i, (name, color) in enumerate(sorted(labels.items()))
+            if i % 20 != 19])
+
+
+def write_config(path, repos=(), labels=None):
+    lines = ['[github]', 'token = thisIsNotRealToken',
+             'webhook_secret = ' + SECRET]
+    if labels is not None:
+        lines += ['[labels]'] + ['{} = {}'.format(l, c)
+                                 for l, c in labels.items()]
+    lines += ['[repos]'] + ['{} = on'.format(r) for r in repos]
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+class Bench:
+    """Runs scenarios against fake GitHub reached over HTTP or in memory."""
+
+    def __init__(self, fake, transport, tmpdir):
+        self.fake = fake
+        self.transport = transport
+        self.tmpdir = tmpdir
+        self.server = FakeGitHubServer(fake) if transport == 'http' else None
+        self.results = []
+
+    def session(self):
+        s = requests.Session()
+        if self.server is not None:
+            s.mount('https://api.github.com', ServerAdapter(self.server.url))
+        else:
+            s.mount('https://api.github.com', self.fake)
+        return s
+
+    def measure(self, name, func, units=None):
+        """Run func and record its wall time and requests, units is tuple
+        of number and name of items processed."""
+        self.fake.requests = []
+        start = time.perf_counter()
+        ok = func()
+        wall = time.perf_counter() - start
+        sent = len(self.fake.requests)
+        result = {'scenario': name, 'wall': wall, 'requests': sent,
+                  'throughput': sent / wall, 'ok': ok}
+        if units is not None:
+            result['items'], result['unit'] = units
+            result['rate'] = units[0] / wall
+        self.results.append(result)
+        return result
+
+    def invoke(self, config, *args):
+        result = CliRunner().invoke(cli, ['-c', config] + list(args),
+                                    obj={'session': self.session()})
+        return result.exit_code == 0
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+
+def webhook_events(repo, count):
+    """Yield bodies of label webhook events of repo creating, editing and
+    deleting labels."""
+    for i in range(count):
+        name = 'hook{:04}'.format(i // 3)
+        action = ['created', 'edited', 'deleted'][i % 3]
+        event = {'action': action, 'repository': {'full_name': repo},
+                 'label': {'name': name, 'color': 'ABCDEF'}}
+        if action == 'edited':
+            event['changes'] = {'color': {'from': '000000'}}
+        yield json.dumps(event).encode()
+
+
+def post_webhooks(bench, config, repo, count):
+    """Post count label webhook events to the web app, return True if all of
+    them succeeded."""
+    os.environ['LABELORD_CONFIG'] = config
+    from labelord import app
+    app.inject_session(bench.session())
+    app.reload_config()
+    client = app.test_client()
+    ok = True
+    for body in webhook_events(repo, count):
+        signature = hmac.new(SECRET.encode(), body, hashlib.sha1).hexdigest()
+        r = client.post('/', data=body, headers={
+            'Content-Type': 'application/json',
+            'X-GitHub-Event': 'label',
+            'X-Hub-Signature': 'sha1=' + signature})
+        ok = ok and r.status_code in (200, 202)
+    return ok
+
+
+def report(results, as_json):
+    if as_json:
+        click.echo(json.dumps(results, indent=2))
+        return
+    click.echo('{:<14} {:>9} {:>9} {:>10} {:>16}'.format(
+        'scenario', 'wall [s]', 'requests', 'req/s', 'items/s'))
+    for r in results:
+        rate = '{:.1f} {}'.format(r['rate'], r['unit']) if 'rate' in r else ''
+        click.echo('{:<14} {:>9.3f} {:>9} {:>10.1f} {:>16}{}'.format(
+            r['scenario'], r['wall'], r['requests'], r['throughput'], rate,
+            '' if r['ok'] else '  FAILED'))
+
+
+@click.command()
+@click.option('--repos', default=2000, help='Number of repositories.')
+@click.option('--labels', default=150, help='Number of labels per repo.')
+@click.option('--latency', default=0.0, help='Latency of fake GitHub [s].')
+@click.option('--error-rate', default=0.0,
+              help='Probability of 502 response of fake GitHub.')
+@click.option('--rate-limit', default=0,
+              help='Requests allowed per hour (0 is unlimited).')
+@click.option('-j', '--jobs', default=8, help='Jobs of run and listing.')
+@click.option('-w', '--label-jobs', default=4, help='Label jobs of run.')
+@click.option('--webhook-repos', default=20,
+              help='Repositories replicated by the web app.')
+@click.option('--events', default=300, help='Number of webhook events.')
+@click.option('--transport', type=click.Choice(['http', 'memory']),
+              default='http', help='Reach fake GitHub over local HTTP '
+              'server or call it directly.')
+@click.option('--json', 'as_json', is_flag=True, help='Output JSON.')
+def bench(repos, labels, latency, error_rate, rate_limit, jobs, label_jobs,
+          webhook_repos, events, transport, as_json):
+    """Benchmark list_repos, list_labels, run and the webhook endpoint."""
+    fake = FakeGitHub(latency=latency, error_rate=error_rate, seed=0)
+    if rate_limit:
+        fake.limit(rate_limit)
+    spec = spec_labels(labels)
+    setup_fake(fake, repos, spec)
+    names = repo_names(repos)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config = os.path.join(tmpdir, 'config.cfg')
+        write_config(config, labels=spec)
+        hooks = os.path.join(tmpdir, 'hooks.cfg')
+        write_config(hooks, repos=names[:webhook_repos])
+        j, w = str(jobs), str(label_jobs)
+
+        b = Bench(fake, transport, tmpdir)
+        try:
+            b.measure('list_repos',
+                      lambda: b.invoke(config, 'list_repos', '-j', j),
+                      (repos, 'repos'))
+            b.measure('list_labels',
+                      lambda: b.invoke(config, 'list_labels', names[0],
+                                       '-j', j), (labels, 'labels'))
+            b.measure('run',
+                      lambda: b.invoke(config, 'run', 'update', '-a',
+                                       '-j', j, '-w', w), (repos, 'repos'))
+            b.measure('run (in sync)',
+                      lambda: b.invoke(config, 'run', 'update', '-a',
+                                       '-j', j, '-w', w), (repos, 'repos'))
+            b.measure('webhook',
+                      lambda: post_webhooks(b, hooks, names[0], events),
+                      (events, 'events'))
+        finally:
+            b.close()
+    report(b.results, as_json)
+
+
+if __name__ == '__main__':
+    bench()
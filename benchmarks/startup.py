@@ -0,0 +1,68 @@
+"""Startup benchmark of labelord command line interface.
+
+    python benchmarks/startup.py --runs 20 --budget 0.3
+
+It measures wall time of 'labelord --help' in fresh interpreters and fails
+when the median exceeds the budget or when the CLI imports the web stack,
+so scripts invoking labelord many times do not get slower unnoticed."""
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+import click
+
+ABS_PATH = os.path.abspath(os.path.dirname(__file__))
+ROOT = os.path.join(ABS_PATH, '..')
+
+# modules which only the web app needs
+WEB_MODULES = ['flask', 'werkzeug', 'jinja2']
+
+CHECK = '''import sys
+from labelord import cli
+print(' '.join(m for m in {!r} if m in sys.modules))'''.format(WEB_MODULES)
+
+
+def run_python(*args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable] + list(args), env=env, check=True,
+                          stdout=subprocess.PIPE,
+                          universal_newlines=True).stdout
+
+
+def startup_times(runs):
+    """Return wall times of runs of 'labelord --help' in seconds."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_python('-m', 'labelord', '--help')
+        times.append(time.perf_counter() - start)
+    return times
+
+
+@click.command()
+@click.option('--runs', default=20, help='Number of measured runs.')
+@click.option('--budget', default=0.3, help='Allowed median wall time [s].')
+@click.option('--json', 'as_json', is_flag=True, help='Output JSON.')
+def startup(runs, budget, as_json):
+    """Benchmark startup of labelord and guard its budget."""
+    # the first run warms up bytecode caches
+    run_python('-m', 'labelord', '--help')
+    times = startup_times(runs)
+    result = {'runs': runs, 'min': min(times),
+              'median': statistics.median(times), 'budget': budget,
+              'web_modules': run_python('-c', CHECK).split()}
+    ok = result['median'] <= budget and not result['web_modules']
+    if as_json:
+        click.echo(json.dumps(result, indent=2))
+    else:
+        click.echo('labelord --help: min {min:.3f} s, median {median:.3f} s '
+                   '(budget {budget:.3f} s)'.format(**result))
+        if result['web_modules']:
+            click.echo('CLI imports ' + ', '.join(result['web_modules']))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    startup()
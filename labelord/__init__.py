@@ -1,14 +1,29 @@
 from .cli import cli
-from .web import LabelordWeb
 
 
 __all__ = [cli]
 
-# http://flask.pocoo.org/docs/0.12/patterns/packages/
-# instantiate LabelordWeb app
-# be careful with configs this is module-wide variable
-# you want to be able to run CLI app as it was in task 1
-app = LabelordWeb(__name__)
 
+def create_app():
+    """Create LabelordWeb app and register its views, return the app
+    created before if there is one."""
+    # http://flask.pocoo.org/docs/0.12/patterns/packages/
+    # be careful with configs this is module-wide variable
+    # you want to be able to run CLI app as it was in task 1
+    global app
+    if 'app' in globals():
+        # the views are registered on import of labelord.views only once
+        return app
+    from .web import LabelordWeb
+    app = LabelordWeb(__name__)
+    import labelord.views  # noqa
+    return app
 
-import labelord.views
+
+def __getattr__(name):
+    # the app (and Flask) is created on first access, e.g. by run_server or
+    # WSGI server loading labelord:app, so CLI does not pay for importing it
+    if name == 'app':
+        return create_app()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__,
+                                                                    name))
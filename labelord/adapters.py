@@ -0,0 +1,284 @@
+import time
+import random
+import socket
+import threading
+import requests
+from urllib3.connection import HTTPConnection
+
+
+class AdapterWrapper(requests.adapters.BaseAdapter):
+    """Transport adapter which passes requests to another adapter. Subclasses
+    add behaviour around sending of requests to GitHub API."""
+
+    def __init__(self, adapter):
+        super().__init__()
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        return self.adapter.send(request, **kwargs)
+
+    def close(self):
+        self.adapter.close()
+
+
+def wrap_adapter(s, wrapper, *args, prefix='https://api.github.com',
+                 **kwargs):
+    """Wrap adapter used by session s for URLs starting with prefix. If the
+    adapter is already wrapped with wrapper, the existing one is returned."""
+    adapter = s.get_adapter(prefix)
+    inner = adapter
+    while isinstance(inner, AdapterWrapper):
+        if isinstance(inner, wrapper):
+            return inner
+        inner = inner.adapter
+    adapter = wrapper(adapter, *args, **kwargs)
+    s.mount(prefix, adapter)
+    return adapter
+
+
+class PooledAdapter(requests.adapters.HTTPAdapter):
+    """HTTP adapter keeping up to size connections to each host alive for
+    reuse. Requests over size wait for a free connection instead of opening
+    ones which would be discarded. With keepalive, idle connections are
+    kept open with TCP keepalive probes after that many seconds."""
+
+    __attrs__ = requests.adapters.HTTPAdapter.__attrs__ + ['size',
+                                                           'keepalive']
+
+    def __init__(self, size=10, keepalive=None):
+        self.size = size
+        self.keepalive = keepalive
+        super().__init__(pool_maxsize=size, pool_block=True)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.keepalive is not None:
+            options = HTTPConnection.default_socket_options + \
+                [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE,
+                                self.keepalive))
+            kwargs['socket_options'] = options
+        super().init_poolmanager(*args, **kwargs)
+
+    def stats(self):
+        """Return tuple of numbers of connections opened and requests sent
+        over them."""
+        pools = [self.poolmanager.pools[key]
+                 for key in self.poolmanager.pools.keys()]
+        return (sum(p.num_connections for p in pools),
+                sum(p.num_requests for p in pools))
+
+
+def transport_adapter(s, prefix='https://api.github.com'):
+    """Return tuple of the innermost wrapper (None if there is none) and the
+    transport adapter used by session s for URLs starting with prefix."""
+    parent, adapter = None, s.get_adapter(prefix)
+    while isinstance(adapter, AdapterWrapper):
+        parent, adapter = adapter, adapter.adapter
+    return parent, adapter
+
+
+def mount_pool(s, size, keepalive=None, prefix='https://api.github.com'):
+    """Make session s keep up to size connections for URLs starting with
+    prefix, the transport adapter under wrappers is replaced with
+    PooledAdapter. Other transport adapters than HTTPAdapter (like test
+    doubles) are left as they are. Return the transport adapter."""
+    parent, adapter = transport_adapter(s, prefix)
+    if type(adapter) not in (requests.adapters.HTTPAdapter, PooledAdapter) \
+       or getattr(adapter, 'size', 0) >= size:
+        return adapter
+    pooled = PooledAdapter(size, keepalive)
+    if parent is None:
+        s.mount(prefix, pooled)
+    else:
+        parent.adapter = pooled
+    return pooled
+
+
+class ConditionalAdapter(AdapterWrapper):
+    """Send GET requests as conditional requests with ETag or Last-Modified
+    of previous response stored in cache. If GitHub responds with 304 Not
+    Modified, the response is completed with cached body and marked with
+    from_cache, wire_status and wire_size attributes."""
+
+    # headers needed to use cached response instead of full one
+    cached_headers = ('Content-Type', 'ETag', 'Last-Modified', 'Link')
+
+    def __init__(self, adapter, cache):
+        super().__init__(adapter)
+        self.cache = cache
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET':
+            return self.adapter.send(request, **kwargs)
+
+        entry = self.cache.get(request.url)
+        if entry is not None:
+            headers, body = entry
+            if 'ETag' in headers:
+                request.headers['If-None-Match'] = headers['ETag']
+            if 'Last-Modified' in headers:
+                request.headers['If-Modified-Since'] = headers['Last-Modified']
+
+        r = self.adapter.send(request, **kwargs)
+
+        if r.status_code == requests.codes.not_modified and entry is not None:
+            # read the empty body to release the connection, the status and
+            # size on the wire are kept for statistics
+            r.wire_status = r.status_code
+            r.wire_size = len(r.content or b'')
+            r.status_code = requests.codes.ok
+            r.reason = 'OK'
+            r.headers.update(headers)
+            r._content = body
+            r.from_cache = True
+        elif r.status_code == requests.codes.ok and \
+                ('ETag' in r.headers or 'Last-Modified' in r.headers):
+            headers = {h: r.headers[h] for h in self.cached_headers
+                       if h in r.headers}
+            self.cache.set(request.url, headers, r.content)
+        return r
+
+
+class RateLimitAdapter(AdapterWrapper):
+    """Schedule requests according to GitHub API rate limit. The state of the
+    limit is tracked from X-RateLimit-Remaining and X-RateLimit-Reset headers.
+    When less than reserve requests remain, requests are spread evenly until
+    the reset time, and when no request remains, they wait for the reset.
+    Requests rejected because of rate limit (also with Retry-After header of
+    abuse detection) are sent again after the wait."""
+
+    def __init__(self, adapter, reserve=100, attempts=3, sleep=time.sleep,
+                 clock=time.time):
+        super().__init__(adapter)
+        self.reserve = reserve
+        self.attempts = attempts
+        self.sleep = sleep
+        self.clock = clock
+        self.remaining = None
+        self.reset = 0
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        for attempt in range(self.attempts):
+            wait = self.delay()
+            if wait > 0:
+                self.sleep(wait)
+            r = self.adapter.send(request, **kwargs)
+            wait = self.update(r)
+            if wait is None or attempt == self.attempts - 1:
+                return r
+            # read the body to release the connection
+            r.content
+            self.sleep(wait)
+
+    def delay(self):
+        """Reserve a slot for a request, return seconds to wait for it."""
+        with self.lock:
+            now = self.clock()
+            if self.remaining is None or self.reset <= now:
+                return 0
+            if self.remaining <= 0:
+                return self.reset - now + 1
+            self.remaining -= 1
+            if self.remaining >= self.reserve:
+                return 0
+            # spread rest of the budget evenly until the reset
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + (self.reset - now) / (self.remaining + 1)
+            return slot - now
+
+    def update(self, r):
+        """Update the state of rate limit from response r. Return seconds to
+        wait before sending the request again if it has been rejected because
+        of the rate limit, otherwise None."""
+        headers = r.headers
+        with self.lock:
+            # GraphQL API has its own limit which is not tracked
+            if 'X-RateLimit-Remaining' in headers and \
+               'X-RateLimit-Reset' in headers and \
+               headers.get('X-RateLimit-Resource', 'core') == 'core':
+                remaining = int(headers['X-RateLimit-Remaining'])
+                reset = int(headers['X-RateLimit-Reset'])
+                # responses of concurrent requests come in any order
+                if reset > self.reset or self.remaining is None:
+                    self.remaining, self.reset = remaining, reset
+                else:
+                    self.remaining = min(self.remaining, remaining)
+            if r.status_code not in (requests.codes.forbidden,
+                                     requests.codes.too_many_requests):
+                return None
+            if 'Retry-After' in headers:
+                return int(headers['Retry-After'])
+            if headers.get('X-RateLimit-Remaining') == '0':
+                return max(self.reset - self.clock(), 0) + 1
+        return None
+
+
+class RetryAdapter(AdapterWrapper):
+    """Send requests again after transient failures of GitHub API (server
+    errors, secondary rate limit, connection problems). Waits between the
+    attempts grow exponentially with random jitter. The request is given up
+    after attempts tries or when the next one would end after deadline
+    seconds. The final response tells how many retries there were."""
+
+    statuses = (requests.codes.internal_server_error,
+                requests.codes.bad_gateway,
+                requests.codes.service_unavailable,
+                requests.codes.gateway_timeout)
+    methods = ('GET', 'POST', 'PATCH', 'DELETE')
+
+    def __init__(self, adapter, attempts=4, backoff=0.5, max_backoff=30,
+                 deadline=60, sleep=time.sleep, clock=time.monotonic):
+        super().__init__(adapter)
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.sleep = sleep
+        self.clock = clock
+
+    def send(self, request, **kwargs):
+        start = self.clock()
+        attempt = 0
+        while True:
+            try:
+                r = self.adapter.send(request, **kwargs)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout):
+                wait = self.wait(request, None, attempt, start)
+                if wait is None:
+                    raise
+            else:
+                wait = self.wait(request, r, attempt, start)
+                if wait is None:
+                    r.retries = attempt
+                    return r
+                # read the body to release the connection
+                r.content
+            self.sleep(wait)
+            attempt += 1
+
+    def transient(self, r):
+        """Check if response r is a failure worth trying again."""
+        if r.status_code in self.statuses:
+            return True
+        return r.status_code == requests.codes.forbidden and \
+            'secondary rate limit' in r.text.lower()
+
+    def wait(self, request, r, attempt, start):
+        """Return seconds to wait before sending request again after response
+        r (None if it failed to arrive), or None if it should not be sent
+        again."""
+        if request.method not in self.methods or \
+           attempt + 1 >= self.attempts or \
+           (r is not None and not self.transient(r)):
+            return None
+        cap = min(self.max_backoff, self.backoff * 2 ** attempt)
+        wait = random.uniform(0, cap)
+        if r is not None and 'Retry-After' in r.headers:
+            wait = max(wait, int(r.headers['Retry-After']))
+        if self.clock() - start + wait > self.deadline:
+            return None
+        return wait
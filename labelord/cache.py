@@ -0,0 +1,287 @@
+import os
+import json
+import sqlite3
+import time
+import itertools
+import threading
+import collections
+
+
+def open_db(path):
+    """Open SQLite database shared by threads of labelord."""
+    path = os.path.expanduser(path)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    return db
+
+
+class ResponseCache:
+    """Persistent cache of GitHub API responses keyed by URL. It stores
+    headers needed for conditional requests together with the body."""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = open_db(path)
+        with self.lock, self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS responses '
+                            '(url TEXT PRIMARY KEY, headers TEXT, body BLOB)')
+
+    def get(self, url):
+        """Return tuple of headers and body cached for url or None."""
+        with self.lock:
+            row = self.db.execute('SELECT headers, body FROM responses '
+                                  'WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, url, headers, body):
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO responses VALUES '
+                            '(?, ?, ?)', (url, json.dumps(headers), body))
+
+
+def changed_labels(labels, act, old_label, new_label, color):
+    """Return list of labels after successful change of a label."""
+    labels = [l for l in labels
+              if act == 'ADD' or l['name'].lower() != old_label.lower()]
+    if act != 'DEL':
+        labels.append({'name': new_label, 'color': color})
+    return labels
+
+
+class MemoryStore:
+    """Store of repositories' labels kept in memory during single run. If
+    persistent store is given, labels missing in memory are got from it
+    and changes are written through to it."""
+
+    def __init__(self, store=None):
+        self.labels = {}
+        self.store = store
+        self.lock = threading.Lock()
+
+    def get(self, repo):
+        with self.lock:
+            labels = self.labels.get(repo)
+        if labels is None and self.store is not None:
+            return self.store.get(repo)
+        return labels
+
+    def set(self, repo, labels):
+        labels = [{'name': l['name'], 'color': l['color']} for l in labels]
+        with self.lock:
+            self.labels[repo] = labels
+        if self.store is not None:
+            self.store.set(repo, labels)
+
+    def update(self, repo, act, old_label, new_label, color):
+        with self.lock:
+            if repo in self.labels:
+                self.labels[repo] = changed_labels(self.labels[repo], act,
+                                                   old_label, new_label, color)
+        if self.store is not None:
+            self.store.update(repo, act, old_label, new_label, color)
+
+    def discard(self, repo):
+        with self.lock:
+            self.labels.pop(repo, None)
+        if self.store is not None:
+            self.store.discard(repo)
+
+
+class ExpiringMultiset:
+    """Multiset of hashable items kept in memory. Each added item expires
+    after ttl seconds and when there are more than size items the oldest
+    ones are evicted. Numbers of hits (items taken), expirations and
+    evictions are counted."""
+
+    def __init__(self, ttl=60, size=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.size = size
+        self.clock = clock
+        # item -> sequence numbers of its occurrences, the oldest first
+        self.items = {}
+        # (expiration, item, sequence number) in order of adding, taken
+        # occurrences are left here until they are reached
+        self.order = collections.deque()
+        self.seq = itertools.count()
+        self.count = 0
+        self.hits = self.expirations = self.evictions = 0
+        self.lock = threading.Lock()
+
+    def add(self, item):
+        with self.lock:
+            now = self.clock()
+            self.expire(now)
+            seq = next(self.seq)
+            self.order.append((now + self.ttl, item, seq))
+            self.items.setdefault(item, collections.deque()).append(seq)
+            self.count += 1
+            while self.count > self.size:
+                if self.pop_oldest():
+                    self.evictions += 1
+            if len(self.order) > 2 * self.size:
+                self.order = collections.deque(
+                    e for e in self.order if self.is_live(e))
+
+    def take(self, item):
+        """Remove one occurrence of item, return True if there was any."""
+        with self.lock:
+            self.expire(self.clock())
+            if not self.remove(item):
+                return False
+            self.hits += 1
+            return True
+
+    def discard(self, item):
+        """Remove one occurrence of item without counting a hit."""
+        with self.lock:
+            self.remove(item)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.order.clear()
+            self.count = 0
+
+    def __contains__(self, item):
+        with self.lock:
+            self.expire(self.clock())
+            return item in self.items
+
+    def __len__(self):
+        with self.lock:
+            self.expire(self.clock())
+            return self.count
+
+    def is_live(self, entry):
+        _, item, seq = entry
+        seqs = self.items.get(item)
+        return seqs is not None and seqs[0] <= seq
+
+    def remove(self, item):
+        seqs = self.items.get(item)
+        if seqs is None:
+            return False
+        seqs.popleft()
+        if not seqs:
+            del self.items[item]
+        self.count -= 1
+        return True
+
+    def pop_oldest(self):
+        """Drop the oldest entry, return True if it was not taken."""
+        entry = self.order.popleft()
+        if not self.is_live(entry):
+            return False
+        self.remove(entry[1])
+        return True
+
+    def expire(self, now):
+        while self.order and self.order[0][0] <= now:
+            if self.pop_oldest():
+                self.expirations += 1
+
+
+class LabelStore:
+    """Persistent store of repositories' labels keyed by repository slug.
+    Each entry expires after ttl seconds and when there are more than size
+    entries the least recently used ones are evicted. With refresh the
+    stored labels are never used but they are still updated."""
+
+    def __init__(self, path, ttl, size=10000, refresh=False):
+        self.ttl = ttl
+        self.size = size
+        self.refresh = refresh
+        self.lock = threading.Lock()
+        self.db = open_db(path)
+        with self.lock, self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS labels '
+                            '(repo TEXT PRIMARY KEY, labels TEXT, '
+                            'expires REAL, used REAL)')
+
+    def get(self, repo):
+        """Return list of labels stored for repo or None if there are no
+        fresh ones."""
+        if self.refresh:
+            return None
+        now = time.time()
+        with self.lock, self.db:
+            row = self.db.execute('SELECT labels FROM labels WHERE repo = ? '
+                                  'AND expires > ?', (repo, now)).fetchone()
+            if row is None:
+                return None
+            self.db.execute('UPDATE labels SET used = ? WHERE repo = ?',
+                            (now, repo))
+        return json.loads(row[0])
+
+    def set(self, repo, labels):
+        labels = [{'name': l['name'], 'color': l['color']} for l in labels]
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO labels VALUES '
+                            '(?, ?, ?, ?)', (repo, json.dumps(labels),
+                                             now + self.ttl, now))
+            self.evict(now)
+
+    def update(self, repo, act, old_label, new_label, color):
+        """Apply successful change of a label to labels stored for repo."""
+        with self.lock, self.db:
+            row = self.db.execute('SELECT labels FROM labels WHERE repo = ?',
+                                  (repo,)).fetchone()
+            if row is None:
+                return
+            labels = changed_labels(json.loads(row[0]), act, old_label,
+                                    new_label, color)
+            self.db.execute('UPDATE labels SET labels = ? WHERE repo = ?',
+                            (json.dumps(labels), repo))
+
+    def discard(self, repo):
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM labels WHERE repo = ?', (repo,))
+
+    def evict(self, now):
+        """Remove expired entries and least recently used entries over size.
+        Caller must hold the lock."""
+        self.db.execute('DELETE FROM labels WHERE expires <= ?', (now,))
+        self.db.execute('DELETE FROM labels WHERE repo IN (SELECT repo FROM '
+                        'labels ORDER BY used DESC LIMIT -1 OFFSET ?)',
+                        (self.size,))
+
+
+class SyncState:
+    """Persistent state of repositories synchronized by incremental run. For
+    each repository the fingerprint of applied labels' specification and
+    ETag of its labels observed in sync with it are recorded. Entries are
+    committed one by one, so the state survives interrupted runs."""
+
+    def __init__(self, path, fingerprint):
+        self.fingerprint = fingerprint
+        self.lock = threading.Lock()
+        self.db = open_db(path)
+        with self.lock, self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS state '
+                            '(repo TEXT PRIMARY KEY, spec TEXT, etag TEXT)')
+
+    def etag(self, repo):
+        """Return ETag of labels of repo in sync with current specification
+        or None if there is no such."""
+        with self.lock:
+            row = self.db.execute('SELECT etag FROM state WHERE repo = ? AND '
+                                  'spec = ?', (repo, self.fingerprint)
+                                  ).fetchone()
+        return None if row is None else row[0]
+
+    def record(self, repo, etag):
+        """Record repo in sync with current specification, etag may be None
+        if it is not known."""
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO state VALUES (?, ?, ?)',
+                            (repo, self.fingerprint, etag))
+
+    def discard(self, repo):
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM state WHERE repo = ?', (repo,))
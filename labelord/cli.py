@@ -1,26 +1,54 @@
 import sys
+import json
+import time
 import click
+import cProfile
+import functools
 import requests
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from . import timing
+from .adapters import transport_adapter
+from .cache import MemoryStore
+from .journal import Journal, read_journal
+from .stats import RequestStats
+from .graphql import prefetched_repos
+from .timing import profiled
 from .helper import parse_config, get_config_repos, get_webhook_secret, \
-                    token_auth, prepare_url, get_token, setup_session
-
-
-def get_resource(s, resource):
-    """Get resource from GitHub API. It is a generator. Handle pagitation."""
+                    token_auth, prepare_url, get_token, setup_session, \
+                    setup_store, setup_state, map_buffered, page_number, \
+                    page_url, background, BufferedWriter, spec_fingerprint
+
+
+def get_pages(s, r, workers=1):
+    """Yield response r of the first page and responses of all following
+    pages. If workers > 1 and the first page links the last one, the
+    following pages are fetched concurrently, otherwise one by one."""
+    yield r
+    if workers > 1 and 'last' in r.links:
+        last = r.links['last']['url']
+        urls = [page_url(last, p) for p in range(2, page_number(last) + 1)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(s.get, urls)
+        return
+    # next page
+    while 'next' in r.links:
+        r = s.get(r.links['next']['url'])
+        yield r
+
+
+@profiled
+def get_resource(s, resource, workers=1):
+    """Get resource from GitHub API. It is a generator. Handle pagitation,
+    up to workers pages are fetched concurrently."""
     url = prepare_url(resource)
     r = s.get(url, params={'per_page': 100, 'page': 1})
 
-    while True:
+    for r in get_pages(s, r, workers):
         r.raise_for_status()
         # yield each item
         for item in r.json():
             yield item
-        # next page
-        try:
-            url = r.links['next']['url']
-        except KeyError:
-            break
-        r = s.get(url)
 
 
 def check_spec(cfg, template_repo, all_repos):
@@ -43,31 +71,70 @@ def labels_dict(labels):
     return {lbl['name'].lower(): (lbl['name'], lbl['color']) for lbl in labels}
 
 
-def labels_spec(s, cfg, template_repo):
+def get_labels(s, repo, workers=1, store=None):
+    """Return list of labels of a repository. Fresh labels from the store are
+    used if there are any, otherwise labels read from GitHub are stored."""
+    if store is not None:
+        labels = store.get(repo)
+        if labels is not None:
+            return labels
+    labels = list(get_resource(s, 'repos/' + repo + '/labels', workers))
+    if store is not None:
+        store.set(repo, labels)
+    return labels
+
+
+def read_labels(s, repo, workers=1, store=None, etag=None):
+    """Read labels of a repository from GitHub, conditionally if etag of
+    previously read labels is given. Return tuple of list of labels (None if
+    they have not been modified) and their ETag (None if they do not fit
+    a single page, as it does not cover the following pages)."""
+    url = prepare_url('repos/' + repo + '/labels')
+    headers = {'If-None-Match': etag} if etag is not None else {}
+    r = s.get(url, params={'per_page': 100, 'page': 1}, headers=headers)
+    if etag is not None and (r.status_code == requests.codes.not_modified or
+                             r.headers.get('ETag') == etag):
+        return None, etag
+
+    labels = []
+    for page in get_pages(s, r, workers):
+        page.raise_for_status()
+        labels += page.json()
+    if store is not None:
+        store.set(repo, labels)
+    return labels, None if 'next' in r.links else r.headers.get('ETag')
+
+
+@profiled
+def labels_spec(s, cfg, template_repo, workers=1, store=None):
     """Return labels of a repository as dictionary. Key is lowercase label's
     name and value is tuple of label and color."""
     if template_repo:
-        labels = get_resource(s, 'repos/' + template_repo + '/labels')
+        labels = get_labels(s, template_repo, workers, store)
         return labels_dict(labels)
     elif cfg.get('others', 'template-repo', fallback=False):
         repo = cfg['others']['template-repo']
-        labels = get_resource(s, 'repos/' + repo + '/labels')
+        labels = get_labels(s, repo, workers, store)
         return labels_dict(labels)
     else:
         return {l.lower(): (l, c) for l, c in cfg['labels'].items()}
 
 
-def repos_spec(s, cfg, all_repos):
-    """Return list of repositories for labelord's run command. Can be
-    specified by '-a/--all-repos' option or in configuration file."""
+@profiled
+def repos_spec(s, cfg, all_repos, workers=1):
+    """Return repositories for labelord's run command. Can be specified by
+    '-a/--all-repos' option or in configuration file. All repositories are
+    returned as generator which lists them page by page."""
     if all_repos:
-        resource = get_resource(s, 'user/repos')
-        return list(repo['full_name'] for repo in resource)
+        resource = get_resource(s, 'user/repos', workers)
+        return (repo['full_name'] for repo in resource)
     return [repo for repo in cfg['repos'] if cfg['repos'].getboolean(repo)]
 
 
-def out_spec(verbose, quiet):
+def out_spec(verbose, quiet, output='text'):
     """Find out what the command line output should be."""
+    if output == 'jsonl':
+        return 'jsonl'
     if verbose and not quiet:
         return 'verbose'
     elif not verbose and quiet:
@@ -76,9 +143,55 @@ def out_spec(verbose, quiet):
         return 'semi'
 
 
-def change_label(s, act, repo, old_label, new_label, color, dry, out):
-    """Add, update or delete label in a repository."""
+def output_echo(ctx, out):
+    """Return function to print output of a command. JSON lines are written
+    by chunks until the end of the command."""
+    if out != 'jsonl':
+        return click.echo
+    writer = BufferedWriter(click.get_text_stream('stdout'))
+    ctx.call_on_close(writer.flush)
+    return writer.echo
+
+
+def retried_success(act, r):
+    """Check if failure of a retried request means that its earlier attempt
+    has already changed the label."""
+    if not getattr(r, 'retries', 0):
+        return False
+    if act == 'ADD' and r.status_code == requests.codes.unprocessable_entity:
+        errors = r.json().get('errors', [])
+        return any(e.get('code') == 'already_exists' for e in errors)
+    return act == 'DEL' and r.status_code == requests.codes.not_found
+
+
+def change_record(act, repo, label, color, result, r=None):
+    """Return JSON line with result of a change of label, with status and
+    time of the request if it has been sent."""
+    record = {'type': 'change', 'action': act, 'repo': repo, 'label': label,
+              'color': color, 'result': result, 'status': None,
+              'elapsed': None}
+    if r is not None:
+        record['status'] = r.status_code
+        record['elapsed'] = r.elapsed.total_seconds()
+        if result == 'ERR':
+            record['message'] = r.json()['message']
+    return json.dumps(record)
+
+
+def error_record(act, r, repo=None):
+    """Return JSON line with failure of reading from GitHub."""
+    return json.dumps({'type': 'error', 'action': act, 'repo': repo,
+                       'status': r.status_code,
+                       'message': r.json()['message']})
+
+
+@profiled
+def change_label(s, act, repo, old_label, new_label, color, dry, out,
+                 store=None, journal=None, echo=click.echo):
+    """Add, update or delete label in a repository. Failure is recorded in
+    journal if it is given."""
     l = old_label if act == 'DEL' else new_label
+    r = None
     if not dry:
         url = prepare_url('repos/' + repo + '/labels')
         if act == 'DEL':
@@ -91,8 +204,17 @@ def change_label(s, act, repo, old_label, new_label, color, dry, out):
             r = s.patch(url + '/' + old_label, json=data)
 
         try:
-            r.raise_for_status()
+            if not retried_success(act, r):
+                r.raise_for_status()
         except requests.exceptions.HTTPError:
+            # stored labels may not match the repository anymore
+            if store is not None:
+                store.discard(repo)
+            if journal is not None:
+                journal.failed(repo, act, old_label, new_label, color)
+            if out == 'jsonl':
+                echo(change_record(act, repo, l, color, 'ERR', r))
+                return 1
             if out == 'verbose':
                 m = '[{}][ERR] {}; {}; {}; {} - {}'
             elif out == 'semi':
@@ -100,49 +222,336 @@ def change_label(s, act, repo, old_label, new_label, color, dry, out):
             if out != 'quiet':
                 error = r.json()['message']
                 st = r.status_code
-                click.echo(m.format(act, repo, l, color, st, error), err=True)
+                echo(m.format(act, repo, l, color, st, error), err=True)
             return 1
 
-    if out == 'verbose':
-        res = 'DRY' if dry else 'SUC'
-        click.echo('[{}][{}] {}; {}; {}'.format(act, res, repo, l, color))
+        if store is not None:
+            store.update(repo, act, old_label, new_label, color)
 
-    return 0
+    res = 'DRY' if dry else 'SUC'
+    if out == 'jsonl':
+        echo(change_record(act, repo, l, color, res, r))
+    elif out == 'verbose':
+        echo('[{}][{}] {}; {}; {}'.format(act, res, repo, l, color))
 
+    return 0
 
-def change_labels(s, repo, new_lbls, mode, dry, out):
-    """Change labels in a repository according to new_lbls."""
-    err = 0
-    labels = get_resource(s, 'repos/' + repo + '/labels')
-    old_lbls = labels_dict(labels)
 
+@profiled
+def diff_labels(old_lbls, new_lbls, mode):
+    """Return changes turning labels old_lbls into new_lbls as list of
+    phases, each phase is list of tuples of action, old label's name, new
+    label's name and color. All additions come before updates and updates
+    before deletions."""
     # add
     add = set(new_lbls) - set(old_lbls)
-    for l in add:
-        err += change_label(s, 'ADD', repo, None, new_lbls[l][0],
-                            new_lbls[l][1], dry, out)
+    phases = [[('ADD', None, new_lbls[l][0], new_lbls[l][1]) for l in add]]
     # update
     upd = {l for l, _ in set(new_lbls.items()) - set(old_lbls.items())} - add
-    for l in upd:
-        err += change_label(s, 'UPD', repo, old_lbls[l][0], new_lbls[l][0],
-                            new_lbls[l][1], dry, out)
+    phases.append([('UPD', old_lbls[l][0], new_lbls[l][0], new_lbls[l][1])
+                   for l in upd])
     # delete
     if mode == 'replace':
-        for l in set(old_lbls) - set(new_lbls):
-            err += change_label(s, 'DEL', repo, old_lbls[l][0], None,
-                                old_lbls[l][1], dry, out)
+        phases.append([('DEL', old_lbls[l][0], None, old_lbls[l][1])
+                       for l in set(old_lbls) - set(new_lbls)])
+    return phases
+
+
+def apply_changes(s, repo, phases, dry, out, workers=1, store=None,
+                  journal=None, echo=click.echo):
+    """Apply phases of changes (see diff_labels) to a repository. Up to
+    workers changes of a phase are sent concurrently, phases one after
+    another. The start, failed changes and the end are recorded in journal
+    if it is given. Return number of errors."""
+    if journal is not None:
+        journal.start(repo)
+    err = 0
+    for phase in phases:
+        calls = [(s, act, repo, old, new, color, dry, out, store, journal)
+                 for act, old, new, color in phase]
+        if workers == 1 or len(calls) < 2:
+            err += sum(change_label(*call, echo=echo) for call in calls)
+        else:
+            jobs = min(workers, len(calls))
+            err += map_buffered(jobs, change_label, calls, echo)
+    if journal is not None:
+        journal.done(repo, err)
+    return err
 
+
+@profiled
+def change_labels(s, repo, new_lbls, mode, dry, out, workers=1, store=None,
+                  plan=None, state=None, journal=None, echo=click.echo):
+    """Change labels in a repository according to new_lbls. Up to workers
+    pages of labels are read and changes are sent concurrently. If plan
+    dictionary is given, the changes are recorded there for the
+    repository. If state of incremental run is given, the repository is
+    skipped when it is recorded in sync and its labels have not been
+    modified since. Changes are recorded in journal if it is given."""
+    if state is None:
+        labels = get_labels(s, repo, workers, store)
+    else:
+        labels, etag = read_labels(s, repo, workers, store, state.etag(repo))
+        if labels is None:
+            # in sync, there are no changes to apply
+            return apply_changes(s, repo, [], dry, out, workers, store,
+                                 journal, echo)
+    phases = diff_labels(labels_dict(labels), new_lbls, mode)
+    if plan is not None:
+        plan[repo] = phases
+    err = apply_changes(s, repo, phases, dry, out, workers, store, journal,
+                        echo)
+
+    if state is not None and not dry:
+        if err:
+            state.discard(repo)
+        else:
+            # ETag of changed labels is observed by the next run
+            state.record(repo, None if count_changes(phases) else etag)
     return err
 
 
+def labels_error(repo, r, out, echo=click.echo):
+    """Report failure of reading labels of a repository."""
+    if out == 'jsonl':
+        echo(error_record('LBL', r, repo))
+        return
+    if out == 'verbose':
+        m = '[LBL][ERR] {}; {} - {}'
+    elif out == 'semi':
+        m = 'ERROR: LBL; {}; {} - {}'
+    if out != 'quiet':
+        echo(m.format(repo, r.status_code, r.json()['message']), err=True)
+
+
+def sync_repo(s, repo, new_lbls, mode, dry, out, workers=1, store=None,
+              plan=None, state=None, journal=None, echo=click.echo):
+    """Change labels in a repository and report failure of reading its
+    labels. Return number of errors."""
+    try:
+        return change_labels(s, repo, new_lbls, mode, dry, out, workers,
+                             store, plan, state, journal, echo=echo)
+    except requests.exceptions.HTTPError as e:
+        labels_error(repo, e.response, out, echo)
+        return 1
+
+
+def sync_repos(s, repos, new_lbls, mode, dry, out, jobs=1, workers=1,
+               store=None, plan=None, state=None, journal=None,
+               echo=click.echo):
+    """Change labels in all repositories, with up to jobs repositories
+    processed concurrently and up to workers changes sent concurrently to
+    each of them. Output of each repository is printed at once and in order
+    of repos. The repositories may be a generator, they are processed as
+    they come. Return list of processed repositories and number of
+    errors."""
+    processed = []
+    failures = []
+
+    def calls():
+        try:
+            for repo in repos:
+                processed.append(repo)
+                yield (s, repo, new_lbls, mode, dry, out, workers, store,
+                       plan, state, journal)
+        except requests.exceptions.HTTPError as e:
+            failures.append(e.response)
+
+    if jobs == 1:
+        err = sum(sync_repo(*call, echo=echo) for call in calls())
+    else:
+        err = map_buffered(jobs, sync_repo, calls(), echo)
+
+    for r in failures:
+        # listing of repositories failed
+        if out == 'jsonl':
+            echo(error_record('LST', r))
+            continue
+        if out == 'verbose':
+            m = '[LST][ERR] {} - {}'
+        elif out == 'semi':
+            m = 'ERROR: LST; {} - {}'
+        if out != 'quiet':
+            echo(m.format(r.status_code, r.json()['message']), err=True)
+    return processed, err + len(failures)
+
+
+def write_plan(f, repos, plan):
+    """Write changes of repositories from plan dictionary to file f, one
+    change per line as JSON list of repository, action, old label's name, new
+    label's name and color."""
+    for repo in repos:
+        for phase in plan.get(repo, []):
+            for change in phase:
+                f.write(json.dumps((repo,) + change) + '\n')
+
+
+def changes_phases(changes):
+    """Return phases (see diff_labels) of changes, tuples of action, old
+    label's name, new label's name and color."""
+    order = ['ADD', 'UPD', 'DEL']
+    phases = [[] for _ in order]
+    for change in changes:
+        phases[order.index(change[0])].append(tuple(change))
+    return phases
+
+
+def read_plan(f):
+    """Read plan written by write_plan from file f. Return dictionary with
+    phases of changes (see diff_labels) for each repository in order of the
+    file."""
+    changes = collections.OrderedDict()
+    for line in f:
+        if not line.strip():
+            continue
+        repo, act, old, new, color = json.loads(line)
+        changes.setdefault(repo, []).append((act, old, new, color))
+    return collections.OrderedDict((repo, changes_phases(c))
+                                   for repo, c in changes.items())
+
+
+def count_changes(phases):
+    """Return number of changes in phases (see diff_labels)."""
+    return sum(len(phase) for phase in phases)
+
+
+def apply_plan(s, plan, dry, out, jobs=1, workers=1, store=None,
+               progress=None, journal=None, echo=click.echo):
+    """Apply changes of repositories from plan dictionary (see read_plan),
+    with up to jobs repositories processed concurrently and up to workers
+    changes sent concurrently to each of them. After a repository is done,
+    progress is called with number of its changes. Return number of
+    errors."""
+    calls = [(s, repo, phases, dry, out, workers, store, journal)
+             for repo, phases in plan.items()]
+
+    def done(call):
+        if progress is not None:
+            progress(count_changes(call[2]))
+
+    if jobs > 1:
+        return map_buffered(jobs, apply_changes, calls, echo, done)
+    err = 0
+    for call in calls:
+        err += apply_changes(*call, echo=echo)
+        done(call)
+    return err
+
+
+def summary(err, message, out, echo=click.echo, **fields):
+    """Print summary of labelord's run and exit with code 10 if there were
+    errors. JSON line output has the fields instead of the message."""
+    if out == 'jsonl':
+        echo(json.dumps(dict({'type': 'summary', 'errors': err}, **fields)))
+        if err:
+            sys.exit(10)
+        return
+
+    if err:
+        m = '{} {} error(s) in total, please check log above'
+        if out == 'verbose':
+            echo(m.format('[SUMMARY]', err), err=True)
+        elif out == 'semi':
+            echo(m.format('SUMMARY:', err), err=True)
+        sys.exit(10)
+
+    if out == 'verbose':
+        echo('[SUMMARY] ' + message)
+    elif out == 'semi':
+        echo('SUMMARY: ' + message)
+
+
+def prepare_run(ctx, all_repos, template_repo, jobs, label_jobs, reader,
+                out, echo=click.echo):
+    """Set up labelord's run. Return session, labels specification,
+    repositories and store of labels. All repositories are listed in
+    background while labels of template repository are read, failure of
+    reading them is reported and labelord exits."""
+    # repositories and pages of their list are processed concurrently
+    setup_session(ctx, jobs * label_jobs + jobs)
+    s = ctx.obj['session']
+    cfg = ctx.obj['config']
+    store = setup_store(ctx)
+
+    check_spec(cfg, template_repo, all_repos)
+    repos = repos_spec(s, cfg, all_repos, jobs)
+    if all_repos:
+        repos = background(repos)
+    try:
+        labels = labels_spec(s, cfg, template_repo, jobs, store)
+    except requests.exceptions.HTTPError as e:
+        template_repo = template_repo or cfg['others']['template-repo']
+        labels_error(template_repo, e.response, out, echo)
+        summary(1, None, out, echo)
+
+    if reader == 'graphql':
+        # prefetched labels are used even with --refresh of persistent store
+        store = MemoryStore(store)
+        repos = prefetched_repos(s, repos, store, workers=jobs)
+    return s, labels, repos, store
+
+
+def connection_summary(s):
+    """Print statistics of connections to GitHub API made by session."""
+    _, adapter = transport_adapter(s)
+    if not hasattr(adapter, 'stats'):
+        click.echo('Connections: not tracked', err=True)
+        return
+    opened, sent = adapter.stats()
+    click.echo('Connections: {} opened, {} request(s), {} reused'
+               .format(opened, sent, sent - opened), err=True)
+
+
+def profile_summary(path):
+    """Report timings of phases (into JSON file path if given) and stop
+    timing them."""
+    profiler, timing.active = timing.active, None
+    if path is None:
+        profiler.report()
+        return
+    with open(path, 'w') as f:
+        profiler.report(f)
+
+
+def stats_summary(requests_stats, path):
+    """Report statistics of requests (into JSON file path if given)."""
+    if path is None:
+        requests_stats.report()
+        return
+    with open(path, 'w') as f:
+        requests_stats.report(f)
+
+
+def cprofile_summary(profiler, path):
+    profiler.disable()
+    profiler.dump_stats(path)
+
+
 @click.group('labelord')
 @click.option('-c', '--config', default='./config.cfg', type=click.Path(),
               help='Configuration file in INI format.')
 @click.option('-t', '--token', envvar='GITHUB_TOKEN',
               help='Access token for GitHub API.')
+@click.option('--no-cache', is_flag=True, default=False,
+              help='Do not use configured cache of GitHub responses.')
+@click.option('--refresh', is_flag=True, default=False,
+              help='Read labels from GitHub even if they are cached.')
+@click.option('--connection-stats', is_flag=True, default=False,
+              help='Print statistics of connections to GitHub at the end.')
+@click.option('--profile', is_flag=True, default=False,
+              help='Print timings of phases of the command at the end.')
+@click.option('--profile-json', type=click.Path(dir_okay=False),
+              help='Write timings of phases as JSON into file.')
+@click.option('--cprofile', type=click.Path(dir_okay=False),
+              help='Write cProfile statistics of the main thread into file.')
+@click.option('--stats', is_flag=True, default=False,
+              help='Print statistics of requests to GitHub at the end.')
+@click.option('--stats-json', type=click.Path(dir_okay=False),
+              help='Write statistics of requests as JSON into file.')
 @click.version_option(0.3)
 @click.pass_context
-def cli(ctx, config, token):
+def cli(ctx, config, token, no_cache, refresh, connection_stats, profile,
+        profile_json, cprofile, stats, stats_json):
     # with 'setup.py' the ctx.obj might be None
     ctx.obj = ctx.obj if ctx.obj else {}
 
@@ -152,23 +561,57 @@ def cli(ctx, config, token):
 
     cfg = parse_config(config)
     ctx.obj['config'] = cfg
+    ctx.obj['config_path'] = config
     ctx.obj['token'] = token
+    ctx.obj['no_cache'] = no_cache
+    ctx.obj['refresh'] = refresh
+    if connection_stats:
+        ctx.call_on_close(functools.partial(connection_summary, session))
+    if profile or profile_json:
+        timing.active = timing.Profiler()
+        ctx.call_on_close(functools.partial(profile_summary, profile_json))
+    if cprofile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        ctx.call_on_close(functools.partial(cprofile_summary, profiler,
+                                            cprofile))
+    if stats or stats_json:
+        requests_stats = RequestStats()
+        session.hooks['response'].append(requests_stats.hook)
+        ctx.call_on_close(functools.partial(stats_summary, requests_stats,
+                                            stats_json))
+
+
+def list_error(r, output, echo=click.echo):
+    """Report failure of listing a resource."""
+    if output == 'jsonl':
+        echo(error_record('LST', r))
+        return
+    m = 'GitHub: ERROR {} - {}'.format(r.status_code, r.json()['message'])
+    echo(m, err=True)
 
 
 @cli.command(help='List all accessible repositories.')
+@click.option('-j', '--jobs', type=click.IntRange(min=1), default=1,
+              help='Number of pages fetched concurrently.')
+@click.option('--output', type=click.Choice(['text', 'jsonl']),
+              default='text', help='Print text or JSON object per line.')
 @click.pass_context
-def list_repos(ctx):
-    setup_session(ctx)
+def list_repos(ctx, jobs, output):
+    setup_session(ctx, jobs)
     s = ctx.obj['session']
+    echo = output_echo(ctx, output)
 
     # https://developer.github.com/v3/repos/
     try:
-        for repo in get_resource(s, 'user/repos'):
-            click.echo(repo['full_name'])
+        for repo in get_resource(s, 'user/repos', jobs):
+            if output == 'jsonl':
+                echo(json.dumps({'type': 'repo', 'name': repo['full_name']}))
+            else:
+                echo(repo['full_name'])
     except requests.exceptions.HTTPError as e:
         r = e.response
-        m = 'GitHub: ERROR {} - {}'.format(r.status_code, r.json()['message'])
-        click.echo(m, err=True)
+        list_error(r, output, echo)
         if r.status_code == requests.codes.unauthorized:
             sys.exit(4)
         sys.exit(10)
@@ -177,19 +620,28 @@ def list_repos(ctx):
 @cli.command(help='''List all labels set for a repository. REPOSLUG is
              URL-friendly version of repository name (user/repository).''')
 @click.argument('reposlug')
+@click.option('-j', '--jobs', type=click.IntRange(min=1), default=1,
+              help='Number of pages fetched concurrently.')
+@click.option('--output', type=click.Choice(['text', 'jsonl']),
+              default='text', help='Print text or JSON object per line.')
 @click.pass_context
-def list_labels(ctx, reposlug):
-    setup_session(ctx)
+def list_labels(ctx, reposlug, jobs, output):
+    setup_session(ctx, jobs)
     s = ctx.obj['session']
+    echo = output_echo(ctx, output)
 
     # https://developer.github.com/v3/issues/labels/
     try:
-        for label in get_resource(s, 'repos/' + reposlug + '/labels'):
-            click.echo('#{} {}'.format(label['color'], label['name']))
+        for label in get_resource(s, 'repos/' + reposlug + '/labels', jobs):
+            if output == 'jsonl':
+                echo(json.dumps({'type': 'label', 'repo': reposlug,
+                                 'name': label['name'],
+                                 'color': label['color']}))
+            else:
+                echo('#{} {}'.format(label['color'], label['name']))
     except requests.exceptions.HTTPError as e:
         r = e.response
-        m = 'GitHub: ERROR {} - {}'.format(r.status_code, r.json()['message'])
-        click.echo(m, err=True)
+        list_error(r, output, echo)
         if r.status_code == requests.codes.unauthorized:
             sys.exit(4)
         if r.status_code == requests.codes.not_found:
@@ -197,56 +649,187 @@ def list_labels(ctx, reposlug):
         sys.exit(10)
 
 
+def run_options(f):
+    """Add options of labels' and repositories' specification and reading
+    shared by run and plan commands."""
+    options = [
+        click.argument('mode', type=click.Choice(['update', 'replace']),
+                       metavar='<update|replace>'),
+        click.option('-a', '--all-repos', is_flag=True, default=False,
+                     help='''Act on all repositories listed by
+                     \'list_repos\' subcommand.'''),
+        click.option('-r', '--template-repo', metavar='REPOSLUG',
+                     help='Template repository to specify labels.'),
+        click.option('-j', '--jobs', type=click.IntRange(min=1), default=1,
+                     help='Number of repositories (or pages of repositories '
+                          'list) processed concurrently.'),
+        click.option('--reader', type=click.Choice(['rest', 'graphql']),
+                     default='rest', help='Read labels of repositories one '
+                     'by one with REST API or in batches with GraphQL API.'),
+    ]
+    for option in reversed(options):
+        f = option(f)
+    return f
+
+
+def output_options(f):
+    """Add options of output shared by commands changing labels."""
+    f = click.option('-q', '--quiet', is_flag=True, default=False,
+                     help='No output at all')(f)
+    f = click.option('-v', '--verbose', is_flag=True, default=False,
+                     help='Print actions to standart ouput.')(f)
+    f = click.option('--output', type=click.Choice(['text', 'jsonl']),
+                     default='text', help='Print text or JSON object per '
+                     'action and result (with -v/-q ignored).')(f)
+    return f
+
+
 @cli.command(help='Run labels processing.')
-@click.argument('mode', type=click.Choice(['update', 'replace']),
-                metavar='<update|replace>')
-@click.option('-a', '--all-repos', is_flag=True, default=False,
-              help='''Act on all repositories listed by \'list_repos\'
-              subcommand.''')
+@run_options
 @click.option('-d', '--dry-run', is_flag=True, default=False,
               help='Print actions but do not apply them on GitHub.')
-@click.option('-r', '--template-repo', metavar='REPOSLUG',
-              help='Template repository to specify labels.')
-@click.option('-v', '--verbose', is_flag=True, default=False,
-              help='Print actions to standart ouput.')
-@click.option('-q', '--quiet', is_flag=True, default=False,
-              help='No output at all')
+@output_options
+@click.option('-w', '--label-jobs', type=click.IntRange(min=1), default=1,
+              help='Number of label changes (or pages of labels) sent '
+                   'concurrently per repository.')
+@click.option('-i', '--incremental', is_flag=True, default=False,
+              help='Skip repositories which are in sync since the last '
+                   'run, labels are read with REST API conditionally.')
+@click.option('--journal', type=click.Path(dir_okay=False),
+              help='Write completed repositories and failed changes to '
+                   'journal FILE (ignored with --resume).')
+@click.option('--resume', type=click.Path(exists=True, dir_okay=False),
+              help='Resume run from journal FILE, skip completed '
+                   'repositories and retry failed changes only. The '
+                   'journal is appended to.')
 @click.pass_context
-def run(ctx, mode, all_repos, dry_run, verbose, quiet, template_repo):
-    setup_session(ctx)
+def run(ctx, mode, all_repos, dry_run, verbose, quiet, output, template_repo,
+        jobs, label_jobs, reader, incremental, journal, resume):
+    start = time.perf_counter()
+    # stored or prefetched labels would not tell whether they are modified
+    reader = 'rest' if incremental else reader
+    out = out_spec(verbose, quiet, output)
+    echo = output_echo(ctx, out)
+    s, labels, repos, store = prepare_run(ctx, all_repos, template_repo,
+                                          jobs, label_jobs, reader, out, echo)
+    state = setup_state(ctx, mode, labels) if incremental else None
+
+    fingerprint = spec_fingerprint(mode, labels)
+    skip, retried, err = set(), [], 0
+    if resume is not None:
+        try:
+            completed, failed = read_journal(resume, fingerprint)
+        except ValueError:
+            click.echo('Journal {} is of different labels specification'
+                       .format(resume), err=True)
+            sys.exit(10)
+        skip = completed | set(failed)
+    if resume is not None and not dry_run:
+        journal = Journal(resume, fingerprint, resume=True)
+        ctx.call_on_close(journal.close)
+    elif journal is not None and not dry_run:
+        journal = Journal(journal, fingerprint)
+        ctx.call_on_close(journal.close)
+    else:
+        journal = None
+    if resume is not None:
+        retried = list(failed)
+        plan = collections.OrderedDict(
+            (repo, changes_phases(changes))
+            for repo, changes in failed.items())
+        err = apply_plan(s, plan, dry_run, out, jobs, label_jobs, store,
+                         journal=journal, echo=echo)
+
+    repos, sync_err = sync_repos(s, (r for r in repos if r not in skip),
+                                 labels, mode, dry_run, out, jobs, label_jobs,
+                                 store, state=state, journal=journal,
+                                 echo=echo)
+    repos = retried + repos
+    err += sync_err
+    summary(err, '{} repo(s) updated successfully'.format(len(repos)), out,
+            echo, repos=len(repos), elapsed=time.perf_counter() - start)
+
+
+@cli.command(help='''Plan labels processing. Changes are written to PLANFILE
+             to be applied by 'apply' subcommand.''')
+@run_options
+@click.argument('planfile', type=click.File('w'))
+@output_options
+@click.option('-w', '--label-jobs', type=click.IntRange(min=1), default=1,
+              help='Number of pages of labels read concurrently per '
+                   'repository.')
+@click.pass_context
+def plan(ctx, mode, all_repos, verbose, quiet, output, template_repo, jobs,
+         label_jobs, reader, planfile):
+    start = time.perf_counter()
+    out = out_spec(verbose, quiet, output)
+    echo = output_echo(ctx, out)
+    s, labels, repos, store = prepare_run(ctx, all_repos, template_repo,
+                                          jobs, label_jobs, reader, out, echo)
+
+    changes = {}
+    repos, err = sync_repos(s, repos, labels, mode, True, out, jobs,
+                            label_jobs, store, changes, echo=echo)
+    write_plan(planfile, repos, changes)
+    total = sum(count_changes(phases) for phases in changes.values())
+    summary(err, '{} change(s) planned for {} repo(s)'.format(total,
+                                                               len(repos)),
+            out, echo, changes=total, repos=len(repos),
+            elapsed=time.perf_counter() - start)
+
+
+@cli.command(help='Apply labels processing planned by \'plan\' subcommand.')
+@click.argument('planfile', type=click.File('r'))
+@click.option('-d', '--dry-run', is_flag=True, default=False,
+              help='Print actions but do not apply them on GitHub.')
+@output_options
+@click.option('-j', '--jobs', type=click.IntRange(min=1), default=1,
+              help='Number of repositories processed concurrently.')
+@click.option('-w', '--label-jobs', type=click.IntRange(min=1), default=1,
+              help='Number of label changes sent concurrently per '
+                   'repository.')
+@click.option('-p', '--progress', is_flag=True, default=False,
+              help='Show progress bar on standard error output.')
+@click.pass_context
+def apply(ctx, planfile, dry_run, verbose, quiet, output, jobs, label_jobs,
+          progress):
+    start = time.perf_counter()
+    setup_session(ctx, jobs * label_jobs)
     s = ctx.obj['session']
+    store = setup_store(ctx)
+    out = out_spec(verbose, quiet, output)
+    echo = output_echo(ctx, out)
+
+    changes = read_plan(planfile)
+    total = sum(count_changes(phases) for phases in changes.values())
+    if progress:
+        with click.progressbar(length=total, label='Applying changes',
+                               show_pos=True,
+                               file=click.get_text_stream('stderr')) as bar:
+            err = apply_plan(s, changes, dry_run, out, jobs, label_jobs,
+                             store, bar.update, echo=echo)
+    else:
+        err = apply_plan(s, changes, dry_run, out, jobs, label_jobs, store,
+                         echo=echo)
+    summary(err, '{} change(s) applied to {} repo(s)'.format(total,
+                                                              len(changes)),
+            out, echo, changes=total, repos=len(changes),
+            elapsed=time.perf_counter() - start)
+
+
+@cli.command(help='Run server for master-to-master replication.')
+@click.option('-h', '--host', default='127.0.0.1', help='Hostname.')
+@click.option('-p', '--port', default=5000, help='Server port.')
+@click.option('-d', '--debug', is_flag=True, default=False, help='Debug mode.')
+@click.pass_context
+def run_server(ctx, host, port, debug):
+    # Flask is imported with the app only here, other commands start fast
+    from . import app
     cfg = ctx.obj['config']
-
-    check_spec(cfg, template_repo, all_repos)
-    labels = labels_spec(s, cfg, template_repo)
-    repos = repos_spec(s, cfg, all_repos)
-    out = out_spec(verbose, quiet)
-
-    err = 0
-    for repo in repos:
-        try:
-            err += change_labels(s, repo, labels, mode, dry_run, out)
-        except requests.exceptions.HTTPError as e:
-            err += 1
-            if out == 'verbose':
-                m = '[LBL][ERR] {}; {} - {}'
-            elif out == 'semi':
-                m = 'ERROR: LBL; {}; {} - {}'
-            if out != 'quiet':
-                r = e.response
-                code = r.status_code
-                click.echo(m.format(repo, code, r.json()['message'], err=True))
-
-    if err:
-        m = '{} {} error(s) in total, please check log above'
-        if out == 'verbose':
-            click.echo(m.format('[SUMMARY]', err, m), err=True)
-        elif out == 'semi':
-            click.echo(m.format('SUMMARY:', err), err=True)
-        sys.exit(10)
-
-    m = '{} {} repo(s) updated successfully'
-    if out == 'verbose':
-        click.echo(m.format('[SUMMARY]', len(repos)))
-    elif out == 'semi':
-        click.echo(m.format('SUMMARY:', len(repos)))
+    setup_session(ctx)
+    # the app is configured, so it does not reload the config on first
+    # request and set up the replication again
+    app.configure(cfg, get_token(cfg, ctx.obj['token']))
+    app.inject_session(ctx.obj['session'])
+    app.setup_replication(cfg)
+    app.run(host=host, port=port, debug=debug)
@@ -0,0 +1,108 @@
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from .helper import prepare_url
+
+
+REPOSITORY = '''r{i}: repository(owner: $o{i}, name: $n{i}) {{
+    labels(first: 100, after: $a{i}) {{
+        nodes {{ name color }}
+        pageInfo {{ hasNextPage endCursor }}
+    }}
+}}'''
+
+
+def labels_query(repos):
+    """Return GraphQL query and its variables which read a page of labels
+    of each repository from list of tuples of repository slug and cursor
+    (None for the first page)."""
+    params, fields, variables = [], [], {}
+    for i, (repo, cursor) in enumerate(repos):
+        params.append('$o{0}: String!, $n{0}: String!, $a{0}: String'
+                      .format(i))
+        fields.append(REPOSITORY.format(i=i))
+        variables['o{}'.format(i)], variables['n{}'.format(i)] = \
+            repo.split('/', 1)
+        variables['a{}'.format(i)] = cursor
+    query = 'query({}) {{\n{}\n}}'.format(', '.join(params),
+                                           '\n'.join(fields))
+    return query, variables
+
+
+def get_labels_page(s, repos):
+    """Read a page of labels of each repository from list of tuples of
+    repository slug and cursor with single request to GitHub GraphQL API.
+    Return list of tuples of repository slug, labels and cursor of the next
+    page (None for the last page). Repositories which cannot be read are left
+    out."""
+    query, variables = labels_query(repos)
+    r = s.post(prepare_url('graphql'),
+               json={'query': query, 'variables': variables})
+    r.raise_for_status()
+    data = r.json().get('data') or {}
+
+    pages = []
+    for i, (repo, _) in enumerate(repos):
+        node = data.get('r{}'.format(i))
+        if node is None:
+            continue
+        labels = node['labels']
+        info = labels['pageInfo']
+        cursor = info['endCursor'] if info['hasNextPage'] else None
+        pages.append((repo, labels['nodes'], cursor))
+    return pages
+
+
+def get_labels_batch(s, repos, batch=50, workers=1):
+    """Return dictionary of labels of repositories read from GitHub GraphQL
+    API, batch repositories per request and up to workers requests at once.
+    Repositories which cannot be read are left out."""
+    labels = {repo: [] for repo in repos}
+    pending = [(repo, None) for repo in repos]
+    while pending:
+        batches = [pending[i:i + batch] for i in range(0, len(pending), batch)]
+        pending = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda b: get_labels_page(s, b), batches)
+            for requested, pages in zip(batches, results):
+                for repo, nodes, cursor in pages:
+                    labels[repo] += nodes
+                    if cursor is not None:
+                        pending.append((repo, cursor))
+                # partially read repositories are left out as well
+                read = {repo for repo, _, _ in pages}
+                for repo, _ in requested:
+                    if repo not in read:
+                        del labels[repo]
+    return labels
+
+
+def prefetch_labels(s, repos, store, batch=50, workers=1):
+    """Read labels of repositories which are not in store with GitHub GraphQL
+    API and put them into the store."""
+    missing = [repo for repo in repos if store.get(repo) is None]
+    for repo, labels in get_labels_batch(s, missing, batch, workers).items():
+        store.set(repo, labels)
+
+
+def prefetched_repos(s, repos, store, batch=50, workers=1):
+    """Yield repositories from repos (it may be a generator), labels of
+    repositories are prefetched into the store by chunks for workers
+    requests at once before they are yielded."""
+    chunk = []
+    for repo in repos:
+        chunk.append(repo)
+        if len(chunk) == batch * workers:
+            prefetch_chunk(s, chunk, store, batch, workers)
+            yield from chunk
+            chunk = []
+    prefetch_chunk(s, chunk, store, batch, workers)
+    yield from chunk
+
+
+def prefetch_chunk(s, repos, store, batch=50, workers=1):
+    """Prefetch labels of repositories, if it fails they are read one by one
+    with REST API then."""
+    try:
+        prefetch_labels(s, repos, store, batch, workers)
+    except requests.exceptions.HTTPError:
+        pass
@@ -1,17 +1,95 @@
 import click
+import collections
 import functools
+import hashlib
+import json
+import queue
 import sys
+import threading
 import configparser
-from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qs, urlencode
+from .adapters import wrap_adapter, mount_pool, ConditionalAdapter, \
+                      RateLimitAdapter, RetryAdapter
+from .cache import ResponseCache, LabelStore, SyncState
 
 
-def setup_session(ctx):
-    """Setup requests' Session object to communicate with GitHub API."""
+def setup_session(ctx, concurrency=1):
+    """Setup requests' Session object to communicate with GitHub API. There
+    are enough connections kept for concurrency requests at once."""
     s = ctx.obj['session']
     token = ctx.obj['token']
     cfg = ctx.obj['config']
     s.headers = {'User-Agent': 'Python'}
     s.auth = functools.partial(token_auth, token=get_token(cfg, token))
+    mount_pool(s, **pool_options(cfg, concurrency))
+    wrap_adapter(s, RateLimitAdapter)
+    wrap_adapter(s, RetryAdapter, **retry_policy(cfg))
+    # conditional requests with responses cached between runs
+    path = cfg.get('cache', 'path', fallback=None)
+    if path is not None and not ctx.obj.get('no_cache'):
+        wrap_adapter(s, ConditionalAdapter, ResponseCache(path))
+
+
+def pool_options(cfg, concurrency=1):
+    """Return keyword arguments for mount_pool from [http] section of the
+    configuration, pool size is at least concurrency."""
+    keepalive = cfg.getint('http', 'keepalive', fallback=None)
+    return {
+        'size': cfg.getint('http', 'pool_size', fallback=max(10, concurrency)),
+        'keepalive': keepalive if keepalive else None,
+    }
+
+
+def retry_policy(cfg):
+    """Return keyword arguments for RetryAdapter from [retry] section of the
+    configuration."""
+    return {
+        'attempts': cfg.getint('retry', 'attempts', fallback=4),
+        'backoff': cfg.getfloat('retry', 'backoff', fallback=0.5),
+        'max_backoff': cfg.getfloat('retry', 'max_backoff', fallback=30),
+        'deadline': cfg.getfloat('retry', 'deadline', fallback=60),
+    }
+
+
+def replication_options(cfg):
+    """Return options of webhook replication from [webhook] section of the
+    configuration."""
+    return {
+        'async': cfg.getboolean('webhook', 'async', fallback=False),
+        'queue_size': cfg.getint('webhook', 'queue_size', fallback=1000),
+        'workers': cfg.getint('webhook', 'workers', fallback=8),
+        'echo_ttl': cfg.getfloat('webhook', 'echo_ttl', fallback=60),
+        'echo_size': cfg.getint('webhook', 'echo_size', fallback=10000),
+        'queue_path': cfg.get('webhook', 'queue_path', fallback=None),
+        'coalesce': cfg.getfloat('webhook', 'coalesce', fallback=0),
+    }
+
+
+def setup_store(ctx):
+    """Return persistent store of repositories' labels if it is configured
+    (cache path and ttl in seconds), otherwise None."""
+    cfg = ctx.obj['config']
+    if ctx.obj.get('no_cache') or not cfg.has_option('cache', 'path') or \
+       not cfg.has_option('cache', 'ttl'):
+        return None
+    return LabelStore(cfg['cache']['path'], cfg.getfloat('cache', 'ttl'),
+                      cfg.getint('cache', 'size', fallback=10000),
+                      ctx.obj.get('refresh', False))
+
+
+def spec_fingerprint(mode, labels):
+    """Return fingerprint of labels' specification (mode and labels
+    dictionary)."""
+    spec = json.dumps([mode, sorted(labels.values())])
+    return hashlib.sha256(spec.encode()).hexdigest()
+
+
+def setup_state(ctx, mode, labels):
+    """Return state of incremental run for labels' specification. It is kept
+    in a file next to the configuration."""
+    return SyncState(ctx.obj['config_path'] + '.state',
+                     spec_fingerprint(mode, labels))
 
 
 def get_token(cfg, token):
@@ -66,3 +144,129 @@ def token_auth(req, token):
 def prepare_url(resource, endpoint='https://api.github.com'):
     """Prepare URL for GitHub API."""
     return urljoin(endpoint, resource)
+
+
+def page_number(url):
+    """Return number of page from URL of paginated GitHub API resource."""
+    return int(parse_qs(urlsplit(url).query)['page'][0])
+
+
+def page_url(url, page):
+    """Return URL of paginated GitHub API resource with page number
+    replaced."""
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    query['page'] = [page]
+    return urlunsplit(parts._replace(query=urlencode(query, doseq=True)))
+
+
+class OutputBuffer:
+    """Collect messages for click.echo and print them later at once, so output
+    produced in a worker thread stays grouped together."""
+
+    def __init__(self):
+        self.messages = []
+
+    def echo(self, message, err=False):
+        self.messages.append((message, err))
+
+    def flush(self, echo=click.echo):
+        for message, err in self.messages:
+            echo(message, err=err)
+        self.messages = []
+
+
+class BufferedWriter:
+    """Write messages for click.echo into stream by chunks of size lines
+    instead of one by one. Messages for standard error output go to the
+    stream as well. Call flush at the end."""
+
+    def __init__(self, stream, size=1000):
+        self.stream = stream
+        self.size = size
+        self.lines = []
+        self.lock = threading.Lock()
+
+    def echo(self, message, err=False):
+        with self.lock:
+            self.lines.append(message)
+            if len(self.lines) >= self.size:
+                self.write()
+
+    def flush(self):
+        with self.lock:
+            self.write()
+
+    def write(self):
+        """Write collected lines. Caller must hold the lock."""
+        if self.lines:
+            self.stream.write('\n'.join(self.lines) + '\n')
+            self.stream.flush()
+            self.lines = []
+
+
+def call_buffered(func, *args):
+    """Call func with its output held back in a buffer. Return result of the
+    call and the buffer."""
+    buf = OutputBuffer()
+    return func(*args, echo=buf.echo), buf
+
+
+def map_buffered(jobs, func, calls, echo=click.echo, done=None):
+    """Call func for each tuple of arguments in calls (it may be a generator)
+    on a pool of jobs threads. Output of each call is passed to echo at once
+    and in order of calls, then done is called with the arguments. Return
+    sum of results."""
+    total = 0
+    pending = collections.deque()
+
+    def finish():
+        args, future = pending.popleft()
+        result, buf = future.result()
+        buf.flush(echo)
+        if done is not None:
+            done(args)
+        return result
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for args in calls:
+            # print output of finished calls while waiting for next ones
+            while pending and pending[0][1].done():
+                total += finish()
+            pending.append((args, executor.submit(call_buffered, func,
+                                                  *args)))
+            # do not take more calls than the pool can work on
+            if len(pending) > 2 * jobs:
+                total += finish()
+        while pending:
+            total += finish()
+    return total
+
+
+def background(iterable, size=1000):
+    """Return generator of items of iterable which are produced in
+    a background thread, up to size items ahead of the consumer. Exception
+    raised by iterable is raised by the generator."""
+    items = queue.Queue(size)
+    end = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put((item, None))
+        except Exception as e:
+            items.put((end, e))
+        else:
+            items.put((end, None))
+
+    def consume():
+        while True:
+            item, error = items.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+
+    threading.Thread(target=produce, daemon=True).start()
+    return consume()
@@ -0,0 +1,72 @@
+import os
+import json
+import threading
+
+
+class Journal:
+    """Append-only journal of a run in JSON lines. It records the start of
+    changes of each repository, each failed change and the end of changes
+    with number of errors. Each record is synced to disk at once. The
+    journal starts with fingerprint of labels' specification, with resume
+    records of resumed run are appended to the existing journal."""
+
+    def __init__(self, path, fingerprint, resume=False):
+        self.lock = threading.Lock()
+        self.f = open(os.path.expanduser(path), 'a' if resume else 'w')
+        if not resume:
+            self.write(event='spec', fingerprint=fingerprint)
+
+    def write(self, **record):
+        with self.lock:
+            self.f.write(json.dumps(record) + '\n')
+            self.f.flush()
+            os.fsync(self.f.fileno())
+
+    def start(self, repo):
+        self.write(event='start', repo=repo)
+
+    def failed(self, repo, act, old_label, new_label, color):
+        self.write(event='failed', repo=repo,
+                   change=[act, old_label, new_label, color])
+
+    def done(self, repo, errors):
+        self.write(event='done', repo=repo, errors=errors)
+
+    def close(self):
+        self.f.close()
+
+
+def read_journal(path, fingerprint):
+    """Read journal of runs for labels' specification with fingerprint.
+    Return set of repositories changed without errors and dictionary with
+    lists of failed changes of repositories changed with errors.
+    Repositories with unfinished changes are in neither. Only records after
+    the last specification's fingerprint are used, raise ValueError if it is
+    of another specification."""
+    completed, failed, finished = set(), {}, set()
+    spec = None
+    with open(os.path.expanduser(path)) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # the last record may be cut off by a crash
+                continue
+            event, repo = record['event'], record.get('repo')
+            if event == 'spec':
+                spec = record['fingerprint']
+                completed, failed, finished = set(), {}, set()
+            elif event == 'start':
+                completed.discard(repo)
+                finished.discard(repo)
+                failed[repo] = []
+            elif event == 'failed':
+                failed.setdefault(repo, []).append(tuple(record['change']))
+            elif event == 'done':
+                finished.add(repo)
+                if not record['errors']:
+                    completed.add(repo)
+    if spec != fingerprint:
+        raise ValueError('different labels specification')
+    return completed, {repo: failed.get(repo, [])
+                       for repo in finished - completed}
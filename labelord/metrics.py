@@ -0,0 +1,138 @@
+import bisect
+import threading
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(n, str(v).replace('\\', '\\\\')
+                                           .replace('"', '\\"'))
+                          for n, v in pairs) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Counter metric with values for each combination of label values."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *values, amount=1):
+        with self.lock:
+            self.values[values] = self.values.get(values, 0) + amount
+
+    def get(self, *values):
+        return self.values.get(values, 0)
+
+    def samples(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            yield self.name + format_labels(self.labels, labels), value
+
+
+class CounterFunc:
+    """Counter metric with value returned by func, for counts kept
+    elsewhere."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, func):
+        self.name = name
+        self.help = help
+        self.func = func
+
+    def samples(self):
+        yield self.name, self.func()
+
+
+class Histogram:
+    """Histogram metric of observed values for each combination of label
+    values, counted into cumulative buckets by their upper bounds."""
+
+    kind = 'histogram'
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, help, labels=(), buckets=None):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets or self.buckets
+        # label values -> [counts of buckets, sum, count]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(values)
+            if entry is None:
+                entry = self.values[values] = [[0] * len(self.buckets), 0, 0]
+            if i < len(self.buckets):
+                entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def get(self, *values):
+        """Return number of observations."""
+        entry = self.values.get(values)
+        return entry[2] if entry else 0
+
+    def samples(self):
+        with self.lock:
+            values = sorted((k, (list(v[0]), v[1], v[2]))
+                            for k, v in self.values.items())
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield self.name + '_bucket' + format_labels(
+                    self.labels, labels, [('le', bound)]), cumulative
+            yield self.name + '_bucket' + format_labels(
+                self.labels, labels, [('le', '+Inf')]), count
+            yield self.name + '_sum' + format_labels(self.labels,
+                                                     labels), total
+            yield self.name + '_count' + format_labels(self.labels,
+                                                       labels), count
+
+
+class Registry:
+    """Collection of metrics exposed in Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def counter_func(self, name, help, func):
+        metric = CounterFunc(name, help, func)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=None):
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def exposition(self):
+        """Return all metrics in Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.help))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.kind))
+            for sample, value in metric.samples():
+                lines.append('{} {}'.format(sample, format_value(value)))
+        return '\n'.join(lines) + '\n'
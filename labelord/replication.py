@@ -0,0 +1,223 @@
+import json
+import time
+import queue
+import threading
+import collections
+from .cache import open_db
+
+
+class ReplicationQueue:
+    """Durable queue of label events to replicate, kept in SQLite database.
+    Events are committed when they are put and deleted when they are
+    acknowledged, so events left by a stopped process are delivered again.
+    Those are marked with 'redelivered' key. There is a single consumer."""
+
+    def __init__(self, path, batch=100):
+        self.batch = batch
+        self.cond = threading.Condition()
+        self.db = open_db(path)
+        with self.cond, self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS jobs (id INTEGER '
+                            'PRIMARY KEY AUTOINCREMENT, event TEXT)')
+            self.recovered, self.pending = self.db.execute(
+                'SELECT IFNULL(MAX(id), 0), COUNT(*) FROM jobs').fetchone()
+        # the last job read by the consumer and jobs read ahead
+        self.cursor = 0
+        self.buffer = collections.deque()
+        self.closed = False
+
+    def put(self, event):
+        with self.cond:
+            with self.db:
+                self.db.execute('INSERT INTO jobs (event) VALUES (?)',
+                                (json.dumps(event),))
+            self.pending += 1
+            self.cond.notify_all()
+
+    def get(self, timeout=None):
+        """Return the oldest job not got yet, tuple of its id and event.
+        Wait for it if there is none (raise queue.Empty after timeout
+        seconds), return None when the queue is closed."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while not self.buffer and not self.closed:
+                rows = self.db.execute('SELECT id, event FROM jobs WHERE '
+                                       'id > ? ORDER BY id LIMIT ?',
+                                       (self.cursor, self.batch)).fetchall()
+                if rows:
+                    self.cursor = rows[-1][0]
+                    self.buffer.extend(rows)
+                elif deadline is None:
+                    self.cond.wait()
+                elif not self.cond.wait(max(deadline - time.monotonic(), 0)):
+                    raise queue.Empty
+            if self.closed:
+                return None
+            job, event = self.buffer.popleft()
+        event = json.loads(event)
+        if job <= self.recovered:
+            event['redelivered'] = True
+        return job, event
+
+    def ack(self, job):
+        with self.cond:
+            with self.db:
+                self.db.execute('DELETE FROM jobs WHERE id = ?', (job,))
+            self.pending -= 1
+            self.cond.notify_all()
+
+    def join(self):
+        """Wait until all jobs are acknowledged."""
+        with self.cond:
+            while self.pending and not self.closed:
+                self.cond.wait()
+
+    def close(self):
+        """Stop consumer, jobs not acknowledged are kept."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def __len__(self):
+        return self.pending
+
+
+class MemoryQueue(queue.Queue):
+    """Queue of label events kept in memory with interface of
+    ReplicationQueue."""
+
+    def put(self, event):
+        super().put((None, event))
+
+    def ack(self, job):
+        self.task_done()
+
+    def close(self):
+        """Stop consumer after all events put so far."""
+        super().put(None)
+
+
+def merge_events(first, second):
+    """Return label event with the same effect on other repositories as
+    event first followed by event second of the same label, None if they
+    cancel out."""
+    if first['action'] == 'created':
+        if second['action'] == 'deleted':
+            return None
+        # the label does not exist in other repositories yet
+        return dict(second, action='created', old=second['label'])
+    if second['action'] == 'deleted':
+        return dict(second, label=first['old'], old=first['old'])
+    return dict(second, action='edited', old=first['old'])
+
+
+def coalesce(jobs):
+    """Merge events of jobs (tuples of id and event) of the same label to
+    single events (see merge_events). Renamed label is followed by its old
+    name, events of a label from another repository are not merged. Event
+    is not merged either if the old or new name of the label was changed by
+    another event since the first event merged with it, so merged events
+    replicated in order of their first jobs have the same effect as the
+    events one by one. Return list of tuples of merged event (None if the
+    events cancel out) and list of ids of its jobs, in order of the first
+    jobs."""
+    merged = []
+    # lowercase name of label -> its entry [event, ids, index of first job]
+    pending = {}
+    # lowercase name -> index of the last event changing it and its entry
+    touched = {}
+    for index, (job, event) in enumerate(jobs):
+        name, old = event['label'].lower(), event['old'].lower()
+        entry = pending.pop(old, None)
+        if entry is not None and entry[0]['repo'] != event['repo']:
+            entry = None
+        if entry is not None and any(
+                toucher is not entry and last > entry[2]
+                for last, toucher in (touched.get(name, (-1, None)),
+                                      touched.get(old, (-1, None)))):
+            # the name is of another label where the merged event is
+            # replicated
+            entry = None
+        if entry is None:
+            entry = [event, [job], index]
+            merged.append(entry)
+        else:
+            redelivered = entry[0].get('redelivered', False)
+            entry[0] = merge_events(entry[0], event)
+            entry[1].append(job)
+            if entry[0] is not None and redelivered:
+                entry[0]['redelivered'] = True
+        touched[name] = touched[old] = index, entry
+        if entry[0] is not None:
+            pending[entry[0]['label'].lower()] = entry
+    return [(event, ids) for event, ids, _ in merged]
+
+
+class ReplicationWorker:
+    """Background thread replicating label events queued by the webhook
+    handler one by one with replicate function. Events are queued in memory
+    and submitting blocks while size events are waiting, or they are queued
+    in durable jobs queue (see ReplicationQueue) if it is given.
+    With window the worker takes events queued within window seconds after
+    the first one and replicates them coalesced (see coalesce). Errors of
+    replication are logged with logger."""
+
+    def __init__(self, replicate, logger, size=1000, jobs=None, window=0):
+        self.replicate = replicate
+        self.logger = logger
+        self.window = window
+        self.queue = MemoryQueue(size) if jobs is None else jobs
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    def submit(self, event):
+        self.queue.put(event)
+
+    def take(self):
+        """Return list of jobs to replicate together and whether the queue
+        is closed."""
+        job = self.queue.get()
+        if job is None:
+            return [], True
+        jobs = [job]
+        deadline = time.monotonic() + self.window
+        while self.window > 0:
+            try:
+                job = self.queue.get(timeout=max(deadline - time.monotonic(),
+                                                 0))
+            except queue.Empty:
+                break
+            if job is None:
+                return jobs, True
+            jobs.append(job)
+        return jobs, False
+
+    def work(self):
+        while True:
+            jobs, closed = self.take()
+            if self.window > 0:
+                events = coalesce(jobs)
+            else:
+                events = [(event, [job]) for job, event in jobs]
+            for event, ids in events:
+                try:
+                    if event is not None:
+                        self.replicate(event)
+                except Exception:
+                    self.logger.exception('Replication of %s failed', event)
+                finally:
+                    # at least once, failed event would fail again
+                    for job in ids:
+                        self.queue.ack(job)
+            if closed:
+                return
+
+    def join(self):
+        """Wait until all submitted events are replicated."""
+        self.queue.join()
+
+    def close(self):
+        """Stop the thread. Events queued in memory are replicated before,
+        those in durable queue are left for the next worker."""
+        self.queue.close()
+        self.thread.join()
@@ -0,0 +1,116 @@
+import json
+import threading
+import collections
+from urllib.parse import urlsplit
+import click
+
+
+def endpoint(url):
+    """Return endpoint of GitHub API URL with owner, repository and label
+    names replaced by placeholders."""
+    path = urlsplit(url).path.strip('/').split('/')
+    if path[0] == 'repos' and len(path) >= 3:
+        path[1:3] = [':owner', ':repo']
+        if len(path) == 5 and path[3] == 'labels':
+            path[4] = ':name'
+    return '/'.join(path)
+
+
+def percentile(values, p):
+    """Return p-th percentile of sorted values (nearest rank)."""
+    if not values:
+        return 0.0
+    rank = max(int(-(-p * len(values) // 100)), 1)
+    return values[rank - 1]
+
+
+class RequestStats:
+    """Statistics of requests sent by a session, collected by its response
+    hook. Add it to the session with s.hooks['response'].append(hook)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = collections.Counter()
+        self.statuses = collections.Counter()
+        self.latencies = []
+        self.sent = 0
+        self.received = 0
+        self.not_modified = 0
+        self.retries = 0
+        self.remaining = None
+        self.reset = 0
+
+    def hook(self, r, *args, **kwargs):
+        body = r.request.body or b''
+        headers = r.headers
+        with self.lock:
+            self.requests[r.request.method, endpoint(r.url)] += 1
+            # filled response of 304 Not Modified is counted as such
+            self.statuses[getattr(r, 'wire_status', r.status_code)] += 1
+            self.latencies.append(r.elapsed.total_seconds())
+            self.sent += len(body)
+            self.received += getattr(r, 'wire_size', len(r.content or b''))
+            if r.status_code == 304 or getattr(r, 'from_cache', False):
+                self.not_modified += 1
+            self.retries += getattr(r, 'retries', 0)
+            if 'X-RateLimit-Remaining' in headers and \
+               headers.get('X-RateLimit-Resource', 'core') == 'core':
+                remaining = int(headers['X-RateLimit-Remaining'])
+                reset = int(headers.get('X-RateLimit-Reset', 0))
+                if reset > self.reset or self.remaining is None:
+                    self.remaining, self.reset = remaining, reset
+                else:
+                    self.remaining = min(self.remaining, remaining)
+        return r
+
+    def summary(self):
+        """Return dictionary with the statistics."""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            gets = sum(n for (method, _), n in self.requests.items()
+                       if method == 'GET')
+            return {
+                'requests': sum(self.requests.values()),
+                'endpoints': [{'method': method, 'endpoint': path,
+                               'requests': n} for (method, path), n
+                              in sorted(self.requests.items())],
+                'statuses': {str(s): n
+                             for s, n in sorted(self.statuses.items())},
+                'bytes_sent': self.sent,
+                'bytes_received': self.received,
+                'latency': {'p50': percentile(latencies, 50),
+                            'p95': percentile(latencies, 95),
+                            'p99': percentile(latencies, 99)},
+                'not_modified': self.not_modified,
+                'not_modified_rate': self.not_modified / gets if gets else 0,
+                'retries': self.retries,
+                'rate_limit_remaining': self.remaining,
+            }
+
+    def report(self, f=None):
+        """Print the statistics on standard error output or write them to
+        file f as JSON."""
+        summary = self.summary()
+        if f is not None:
+            json.dump(summary, f, indent=2)
+            return
+
+        def echo(message):
+            click.echo(message, err=True)
+
+        echo('[STATS] {} request(s), {} B sent, {} B received'.format(
+            summary['requests'], summary['bytes_sent'],
+            summary['bytes_received']))
+        for e in summary['endpoints']:
+            echo('[STATS] {:>6} {} {}'.format(e['requests'], e['method'],
+                                              e['endpoint']))
+        echo('[STATS] statuses ' + ', '.join(
+            '{} {}'.format(s, n) for s, n in summary['statuses'].items()))
+        echo('[STATS] latency p50 {p50:.3f} s, p95 {p95:.3f} s, '
+             'p99 {p99:.3f} s'.format(**summary['latency']))
+        echo('[STATS] {} not modified ({:.1%} of GET), {} retries'.format(
+            summary['not_modified'], summary['not_modified_rate'],
+            summary['retries']))
+        if summary['rate_limit_remaining'] is not None:
+            echo('[STATS] rate limit remaining {}'.format(
+                summary['rate_limit_remaining']))
@@ -0,0 +1,94 @@
+import time
+import json
+import inspect
+import functools
+import threading
+import click
+
+# profiler of the running command, phases are not timed without it
+active = None
+
+
+class Profiler:
+    """Timings of phases of a command. Each phase has number of calls, wall
+    and CPU time (of the thread which ran it) in seconds. Time of a phase
+    includes time of phases called from it."""
+
+    def __init__(self):
+        self.phases = {}
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.start_cpu = time.process_time()
+
+    def add(self, name, wall, cpu, calls=1):
+        with self.lock:
+            phase = self.phases.setdefault(name, [0, 0.0, 0.0])
+            phase[0] += calls
+            phase[1] += wall
+            phase[2] += cpu
+
+    def summary(self):
+        """Return dictionary with total times and times of phases."""
+        return {
+            'total': {'wall': time.perf_counter() - self.start,
+                      'cpu': time.process_time() - self.start_cpu},
+            'phases': {name: {'calls': calls, 'wall': wall, 'cpu': cpu}
+                       for name, (calls, wall, cpu)
+                       in sorted(self.phases.items())},
+        }
+
+    def report(self, f=None):
+        """Print compact breakdown on standard error output or write it to
+        file f as JSON."""
+        summary = self.summary()
+        if f is not None:
+            json.dump(summary, f, indent=2)
+            return
+        m = '{:<14} {:>7} {:>9} {:>9}'
+        click.echo(m.format('phase', 'calls', 'wall [s]', 'cpu [s]'),
+                   err=True)
+        m = '{:<14} {:>7} {:>9.3f} {:>9.3f}'
+        for name, phase in summary['phases'].items():
+            click.echo(m.format(name, phase['calls'], phase['wall'],
+                                phase['cpu']), err=True)
+        total = summary['total']
+        click.echo(m.format('total', '', total['wall'], total['cpu']),
+                   err=True)
+
+
+def timed_generator(name, profiler, gen):
+    """Yield from generator gen, the time it takes to produce items is added
+    to the phase."""
+    while True:
+        start, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            item = next(gen)
+        except StopIteration:
+            return
+        finally:
+            profiler.add(name, time.perf_counter() - start,
+                         time.thread_time() - start_cpu, 0)
+        yield item
+
+
+def profiled(func):
+    """Decorate func to time its calls as a phase named after it when
+    a profiler is active. When it returns a generator, its iteration is
+    timed as well."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = active
+        if profiler is None:
+            return func(*args, **kwargs)
+        start, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profiler.add(name, time.perf_counter() - start,
+                         time.thread_time() - start_cpu)
+        if inspect.isgenerator(result):
+            return timed_generator(name, profiler, result)
+        return result
+    return wrapper
@@ -1,10 +1,7 @@
+import time
 import flask
-import click
 from urllib.parse import urljoin
-from .helper import parse_config, get_config_repos, get_webhook_secret, \
-                    token_auth, prepare_url, setup_session
 from labelord import app
-from .cli import cli
 
 
 @app.before_first_request
@@ -21,6 +18,13 @@ def repo_url(repo):
     return urljoin('https://github.com', repo)
 
 
+@app.route('/metrics')
+def metrics():
+    """Expose metrics of the application in Prometheus text format."""
+    return flask.Response(flask.current_app.metrics.exposition(),
+                          mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     current_app = flask.current_app
@@ -29,64 +33,53 @@ def index():
         return flask.render_template('index.html', repos=current_app.repos)
 
     # POST method
+    start = time.perf_counter()
+    body, status = webhook(current_app, request)
+    current_app.request_seconds.observe(time.perf_counter() - start, status)
+    return body, status
+
+
+def webhook(current_app, request):
+    """Process GitHub webhook request, return body and status of the
+    response."""
     if not current_app.verify_signature(request):
+        current_app.signature_failures_total.inc()
         return '', 401
 
     # check event
     event = request.headers.get('X-GitHub-Event', None)
     if event == 'ping':
+        current_app.events_total.inc(event, '')
         return '', 200
     elif event != 'label':
         # not allowed event
+        current_app.events_total.inc(str(event), '')
         return '', 400
 
     response = request.get_json()
+    action = response['action']
+    current_app.events_total.inc(event, action)
 
     # check repository validity
     repo = response['repository']['full_name']
     if repo not in current_app.repos:
         return '', 400
 
-    action = response['action']
     label = response['label']['name']
     color = response['label']['color']
 
     if current_app.should_ignore_event(action, repo, label, color):
+        current_app.ignored_events_total.inc()
         return '', 200
 
-    data = {'name': label, 'color': color}
-    for r in current_app.repos - {repo}:
-        url = prepare_url('repos/' + r + '/labels')
-
-        if action == 'created':
-            current_app.session.post(url, json=data)
-
-        elif action == 'edited':
-            current_app.ignored_events.append((action, r, label, color))
-            try:
-                label = response['changes']['name']['from']
-            except KeyError:
-                pass
-            current_app.session.patch(url + '/' + label, json=data)
-
-        elif action == 'deleted':
-            current_app.ignored_events.append((action, r, label))
-            current_app.session.delete(url + '/' + label)
-
-        else:
-            return '', 500
-
+    if action not in ('created', 'edited', 'deleted'):
+        return '', 500
+    old = response.get('changes', {}).get('name', {}).get('from', label)
+    event = {'action': action, 'repo': repo, 'label': label, 'color': color,
+             'old': old}
+    if current_app.replication is not None:
+        # replicated in background, GitHub does not wait for it
+        current_app.replication.submit(event)
+        return '', 202
+    current_app.replicate(event)
     return '', 200
-
-
-@cli.command(help='Run server for master-to-master replication.')
-@click.option('-h', '--host', default='127.0.0.1', help='Hostname.')
-@click.option('-p', '--port', default=5000, help='Server port.')
-@click.option('-d', '--debug', is_flag=True, default=False, help='Debug mode.')
-@click.pass_context
-def run_server(ctx, host, port, debug):
-    app.repos = get_config_repos(ctx.obj['config'])
-    setup_session(ctx)
-    app.webhook_secret = get_webhook_secret(ctx.obj['config'])
-    app.inject_session(ctx.obj['session'])
-    app.run(host=host, port=port, debug=debug)
@@ -1,11 +1,19 @@
 import os
+import time
 import functools
 import requests
 import flask
 import hmac
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from .helper import parse_config, get_config_repos, get_webhook_secret, \
-                    token_auth, get_token
+                    token_auth, get_token, retry_policy, pool_options, \
+                    prepare_url, replication_options
+from .adapters import wrap_adapter, mount_pool, RateLimitAdapter, \
+                      RetryAdapter
+from .cache import ExpiringMultiset
+from .metrics import Registry
+from .replication import ReplicationWorker, ReplicationQueue
 
 
 class LabelordWeb(flask.Flask):
@@ -13,10 +21,53 @@ class LabelordWeb(flask.Flask):
     token = None
     webhook_secret = None
     repos = set()
-    ignored_events = list()
+    # events of replicated changes which GitHub sends back
+    ignored_events = ExpiringMultiset()
+    # background worker of asynchronous replication, None if synchronous
+    replication = None
+    # executor of concurrent fan-out, None if it is sequential
+    executor = None
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.setup_metrics()
+
+    def setup_metrics(self):
+        """Create metrics of webhook processing exposed at /metrics."""
+        m = self.metrics = Registry()
+        self.events_total = m.counter(
+            'labelord_webhook_events_total',
+            'Webhook events received by type and action.',
+            ('event', 'action'))
+        self.signature_failures_total = m.counter(
+            'labelord_webhook_signature_failures_total',
+            'Webhook requests with invalid signature.')
+        self.ignored_events_total = m.counter(
+            'labelord_webhook_ignored_events_total',
+            'Label events ignored as echoes of replicated changes.')
+        self.echo_expirations_total = m.counter_func(
+            'labelord_echo_expirations_total',
+            'Expected echoes of replicated changes which did not arrive '
+            'in time.', lambda: self.ignored_events.expirations)
+        self.echo_evictions_total = m.counter_func(
+            'labelord_echo_evictions_total',
+            'Expected echoes of replicated changes evicted by size limit.',
+            lambda: self.ignored_events.evictions)
+        self.replication_failures_total = m.counter(
+            'labelord_replication_failures_total',
+            'Label events not replicated by target repository and action.',
+            ('repo', 'action'))
+        self.github_requests_total = m.counter(
+            'labelord_github_requests_total',
+            'Requests replicating label events by target repository, '
+            'method and status.', ('repo', 'method', 'status'))
+        self.fanout_seconds = m.histogram(
+            'labelord_fanout_duration_seconds',
+            'Time of replicating a label event to all repositories.')
+        self.request_seconds = m.histogram(
+            'labelord_webhook_duration_seconds',
+            'Time of handling webhook requests by response status.',
+            ('status',))
 
     def inject_session(self, session):
         # inject session for communication with GitHub
@@ -33,11 +84,50 @@ class LabelordWeb(flask.Flask):
         check if everything is correctly set-up."""
         path = os.getenv('LABELORD_CONFIG', default='./config.cfg')
         cfg = parse_config(path)
-        self.repos = get_config_repos(cfg)
-        self.token = get_token(cfg, token=None)
-        self.webhook_secret = get_webhook_secret(cfg)
+        self.configure(cfg, get_token(cfg, token=None))
         self.session.headers = {'User-Agent': 'Python'}
         self.session.auth = functools.partial(token_auth, token=self.token)
+        options = replication_options(cfg)
+        mount_pool(self.session, **pool_options(cfg, options['workers']))
+        wrap_adapter(self.session, RateLimitAdapter)
+        wrap_adapter(self.session, RetryAdapter, **retry_policy(cfg))
+        self.setup_replication(cfg)
+
+    def configure(self, cfg, token):
+        """Set repositories, token, webhook secret and store of expected
+        echoes from the configuration. The session and replication are set
+        up separately."""
+        self.repos = get_config_repos(cfg)
+        self.token = token
+        self.webhook_secret = get_webhook_secret(cfg)
+        options = replication_options(cfg)
+        self.ignored_events = ExpiringMultiset(options['echo_ttl'],
+                                               options['echo_size'])
+
+    def setup_replication(self, cfg):
+        """Start background worker of replication if [webhook] section of
+        the configuration enables async, otherwise events are replicated
+        before the webhook is answered. With queue_path the events are
+        queued durably and those pending are replicated at start. With
+        coalesce the queued events of a label within that many seconds are
+        merged when they are taken from the queue. Each event is replicated
+        to up to workers repositories concurrently."""
+        if self.replication is not None:
+            self.replication.close()
+            self.replication = None
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        options = replication_options(cfg)
+        if options['workers'] > 1:
+            self.executor = ThreadPoolExecutor(options['workers'])
+        if options['async']:
+            jobs = None
+            if options['queue_path'] is not None:
+                jobs = ReplicationQueue(options['queue_path'])
+            self.replication = ReplicationWorker(self.replicate, self.logger,
+                                                 options['queue_size'], jobs,
+                                                 options['coalesce'])
 
     def verify_signature(self, request):
         """Check the request's signature."""
@@ -54,7 +144,79 @@ class LabelordWeb(flask.Flask):
         item = (action, repo, label, color)
         if action == 'deleted':
             item = (action, repo, label)
-        if item in self.ignored_events:
-            self.ignored_events.remove(item)
-            return True
-        return False
+        return self.ignored_events.take(item)
+
+    def replicate(self, event):
+        """Replicate label event (dictionary with action, repo, label,
+        color and old name of the label) to other repositories. Return
+        list of failures, tuples of repository and status code (None if
+        there is no response)."""
+        start = time.perf_counter()
+        targets = sorted(self.repos - {event['repo']})
+        if self.executor is None or len(targets) < 2:
+            statuses = [self.replicate_to(r, event) for r in targets]
+        else:
+            statuses = list(self.executor.map(
+                functools.partial(self.replicate_to, event=event), targets))
+        self.fanout_seconds.observe(time.perf_counter() - start)
+
+        failures = [(r, status) for r, status in zip(targets, statuses)
+                    if status is None or status >= 400]
+        for r, status in failures:
+            self.replication_failures_total.inc(r, event['action'])
+        if failures:
+            self.logger.warning('Label %s %s in %s not replicated to %s',
+                                event['label'], event['action'],
+                                event['repo'], ', '.join(
+                                    '{} ({})'.format(r, status or 'error')
+                                    for r, status in failures))
+        return failures
+
+    def replicate_to(self, r, event):
+        """Replicate label event to repository r. Return status code of the
+        response, None if the request failed without it. Event delivered
+        again may have been replicated already, so the label which exists
+        or does not exist as a result of the event is not a failure."""
+        action, label, color = event['action'], event['label'], event['color']
+        url = prepare_url('repos/' + r + '/labels')
+        data = {'name': label, 'color': color}
+        # GitHub sends back event of the change which has to be ignored
+        echo = None
+        if action == 'edited':
+            echo = (action, r, label, color)
+        elif action == 'deleted':
+            echo = (action, r, label)
+        if echo is not None:
+            self.ignored_events.add(echo)
+
+        redelivered = event.get('redelivered', False)
+        if action == 'created':
+            status = self.send(r, 'POST', url, data)
+            if redelivered and status == 422:
+                status = self.send(r, 'PATCH', url + '/' + label, data)
+        elif action == 'edited':
+            status = self.send(r, 'PATCH', url + '/' + event['old'], data)
+            if redelivered and status == 404 and event['old'] != label:
+                status = self.send(r, 'PATCH', url + '/' + label, data)
+        else:
+            status = self.send(r, 'DELETE', url + '/' + label)
+            if redelivered and status == 404:
+                status = 204
+        if echo is not None and (status is None or status >= 400):
+            # the change did not happen, there will be no echo
+            self.ignored_events.discard(echo)
+        return status
+
+    def send(self, r, method, url, data=None):
+        """Send request changing label of repository r, return status code
+        of the response or None if there is none."""
+        send = getattr(self.session, method.lower())
+        try:
+            if data is None:
+                status = send(url).status_code
+            else:
+                status = send(url, json=data).status_code
+        except requests.exceptions.RequestException:
+            status = None
+        self.github_requests_total.inc(r, method, status or 'error')
+        return status
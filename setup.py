@@ -17,6 +17,8 @@ setup(
     package_data={'labelord': ['templates/*.html']},
     keywords='github,labels,cli,mi-pyt',
     install_requires=['click>=6', 'requests>=2.18', 'Flask>=0.12'],
+    # lazy labelord.app relies on module __getattr__ (PEP 562)
+    python_requires='>=3.7',
     # http://click.pocoo.org/5/setuptools/
     entry_points={
         'console_scripts': [
@@ -24,7 +26,7 @@ setup(
             ],
         },
     classifiers=[
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3',
         'License :: OSI Approved :: GNU General Public License v3 (GPLv3)',
         'Framework :: Flask',
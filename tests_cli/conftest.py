@@ -1,6 +1,7 @@
 import sys, os
 import betamax
 import json
+import collections
 import pytest
 import requests
 
@@ -115,3 +116,46 @@ def invoker(betamax_session):
 @pytest.fixture
 def invoker_norec():
     return invoker(None)
+
+
+@pytest.fixture
+def fake_github():
+    from fakegithub import FakeGitHub
+    return FakeGitHub()
+
+
+@pytest.fixture
+def fake_invoker(fake_github, tmpdir):
+    from click.testing import CliRunner
+    from labelord import cli
+
+    def invoker_inner(*args, labels=None, repos=None, extra=()):
+        config = tmpdir.join('config.cfg')
+        lines = ['[github]', 'token = thisIsNotRealToken'] + list(extra)
+        if labels is not None:
+            lines += ['[labels]'] + ['{} = {}'.format(l, c)
+                                     for l, c in labels.items()]
+        if repos is not None:
+            lines += ['[repos]'] + ['{} = on'.format(r) for r in repos]
+        config.write('\n'.join(lines) + '\n')
+
+        session = requests.Session()
+        session.mount('https://api.github.com', fake_github)
+        runner = CliRunner()
+        result = runner.invoke(cli, ['-c', str(config)] + list(args),
+                               obj={'session': session})
+        return LabelordInvocation(runner, result, session)
+    return invoker_inner
+
+
+Fleet = collections.namedtuple('Fleet', 'labels repos')
+
+
+@pytest.fixture
+def repo_fleet(fake_github):
+    """Repositories with label1 of another color than in the labels."""
+    fleet = Fleet({'label1': 'FFAA00', 'label2': 'CCAAFF'},
+                  ['MarekSuchanek/repo{}'.format(i) for i in range(4)])
+    for repo in fleet.repos:
+        fake_github.add_repo(repo, [('label1', '000000')])
+    return fleet
@@ -0,0 +1,318 @@
+import json
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+import requests
+from labelord.adapters import PooledAdapter
+
+
+class FakeGitHub(requests.adapters.BaseAdapter):
+    """In-memory stand-in for the parts of GitHub API used by labelord.
+    Mount it to a session for 'https://api.github.com'."""
+
+    def __init__(self, repos=None, latency=0, error_rate=0, seed=None):
+        super().__init__()
+        # repository slug -> {lowercase name: label}
+        self.repos = {}
+        for repo, labels in (repos or {}).items():
+            self.add_repo(repo, labels)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.rate_limit = None
+        self.requests = []
+        self.faults = []
+        self.not_modified = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def add_repo(self, repo, labels=()):
+        self.repos[repo] = {name.lower(): {'name': name, 'color': color}
+                            for name, color in labels}
+
+    def labels(self, repo):
+        return {(l['name'], l['color']) for l in self.repos[repo].values()}
+
+    def count(self, method):
+        return sum(1 for m, _ in self.requests if m == method)
+
+    def fail(self, status, times=1, after=False, skip=0, path=None):
+        """Answer next requests with status (None means connection error),
+        after skip requests are answered normally. With after the request is
+        processed before it fails, like when the response gets lost. With
+        path only requests with URL containing it are counted."""
+        self.faults += [(path, None)] * skip + \
+            [(path, (status, after))] * times
+
+    def limit(self, budget, window=3600):
+        """Allow only budget requests per window seconds like GitHub API rate
+        limit does."""
+        self.rate_limit = budget
+        self.rate_window = window
+        self.rate_remaining = budget
+        self.rate_reset = int(time.time() + window)
+
+    def fault(self, request):
+        """Pop fault for request, None if it is answered normally. With
+        error_rate requests fail randomly with 502 as well."""
+        for i, (path, fault) in enumerate(self.faults):
+            if path is None or path in request.url:
+                del self.faults[i]
+                return fault
+        if self.error_rate and self.random.random() < self.error_rate:
+            return (502, False)
+        return None
+
+    def rate_headers(self):
+        """Count request to rate limit, return its headers or None if the
+        limit is exceeded."""
+        if self.rate_limit is None:
+            return {}
+        now = time.time()
+        if now >= self.rate_reset:
+            self.rate_remaining = self.rate_limit
+            self.rate_reset = int(now + self.rate_window)
+        exceeded = self.rate_remaining == 0
+        self.rate_remaining = max(self.rate_remaining - 1, 0)
+        headers = {'X-RateLimit-Limit': str(self.rate_limit),
+                   'X-RateLimit-Remaining': str(self.rate_remaining),
+                   'X-RateLimit-Reset': str(self.rate_reset)}
+        return None if exceeded else headers
+
+    def send(self, request, **kwargs):
+        with self.lock:
+            self.requests.append((request.method, request.url))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            with self.lock:
+                rate = self.rate_headers()
+                fault = self.fault(request) if rate is not None else None
+                if rate is None:
+                    status, body, headers = 403, {
+                        'message': 'API rate limit exceeded'}, {
+                        'X-RateLimit-Remaining': '0',
+                        'X-RateLimit-Reset': str(self.rate_reset)}
+                elif fault is None or fault[1]:
+                    status, body, headers = self.handle(request)
+                    headers.update(rate)
+            if fault is not None:
+                if fault[0] is None:
+                    raise requests.exceptions.ConnectionError('Fault')
+                status, body, headers = fault[0], {'message': 'Fault'}, {}
+        finally:
+            with self.lock:
+                self.active -= 1
+        return self.build_response(request, status, body, headers)
+
+    def close(self):
+        pass
+
+    def build_response(self, request, status, body, headers):
+        r = requests.Response()
+        r.status_code = status
+        r.headers.update(headers)
+        r._content = b'' if body is None else json.dumps(body).encode()
+        r.encoding = 'utf-8'
+        r.url = request.url
+        r.request = request
+        return r
+
+    def page(self, request, items):
+        url = urlsplit(request.url)
+        query = parse_qs(url.query)
+        per_page = min(int(query.get('per_page', [30])[0]), 100)
+        page = int(query.get('page', [1])[0])
+        last = max(1, -(-len(items) // per_page))
+        base = '{}://{}{}?per_page={}&page='.format(url.scheme, url.netloc,
+                                                     url.path, per_page)
+        links = []
+        if page < last:
+            links.append('<{}{}>; rel="next"'.format(base, page + 1))
+            links.append('<{}{}>; rel="last"'.format(base, last))
+        if page > 1:
+            links.append('<{}1>; rel="first"'.format(base))
+            links.append('<{}{}>; rel="prev"'.format(base, page - 1))
+        headers = {'Link': ', '.join(links)} if links else {}
+        start = (page - 1) * per_page
+        body = items[start:start + per_page]
+        etag = hashlib.md5(json.dumps([body, headers]).encode()).hexdigest()
+        headers['ETag'] = '"{}"'.format(etag)
+        if request.headers.get('If-None-Match') == headers['ETag']:
+            self.not_modified += 1
+            return 304, None, headers
+        return 200, body, headers
+
+    def graphql(self, payload):
+        """Answer query of labels_query, repository aliased r<i> is given by
+        variables o<i> (owner), n<i> (name) and a<i> (cursor)."""
+        variables = payload['variables']
+        data, errors = {}, []
+        i = 0
+        while 'o{}'.format(i) in variables:
+            alias = 'r{}'.format(i)
+            assert alias + ': repository(' in payload['query']
+            repo = '{}/{}'.format(variables['o{}'.format(i)],
+                                  variables['n{}'.format(i)])
+            if repo not in self.repos:
+                data[alias] = None
+                errors.append({'type': 'NOT_FOUND', 'path': [alias]})
+            else:
+                labels = list(self.repos[repo].values())
+                start = int(variables['a{}'.format(i)] or 0)
+                nodes = labels[start:start + 100]
+                end = start + len(nodes)
+                data[alias] = {'labels': {'nodes': nodes, 'pageInfo': {
+                    'hasNextPage': end < len(labels),
+                    'endCursor': str(end)}}}
+            i += 1
+        body = {'data': data}
+        if errors:
+            body['errors'] = errors
+        return 200, body, {}
+
+    def handle(self, request):
+        path = [unquote(p) for p in urlsplit(request.url).path.split('/')[1:]]
+        if path == ['graphql'] and request.method == 'POST':
+            return self.graphql(json.loads(request.body.decode()))
+        if path == ['user', 'repos']:
+            return self.page(request, [{'full_name': r} for r in self.repos])
+        if len(path) < 4 or path[0] != 'repos' or path[3] != 'labels':
+            return 404, {'message': 'Not Found'}, {}
+        repo = path[1] + '/' + path[2]
+        if repo not in self.repos:
+            return 404, {'message': 'Not Found'}, {}
+        labels = self.repos[repo]
+
+        if request.method == 'GET' and len(path) == 4:
+            return self.page(request, list(labels.values()))
+        if request.method == 'POST' and len(path) == 4:
+            data = json.loads(request.body.decode())
+            if data['name'].lower() in labels:
+                return 422, {'message': 'Validation Failed',
+                             'errors': [{'code': 'already_exists'}]}, {}
+            labels[data['name'].lower()] = data
+            return 201, data, {}
+
+        name = path[4].lower() if len(path) == 5 else None
+        if name not in labels:
+            return 404, {'message': 'Not Found'}, {}
+        if request.method == 'PATCH':
+            data = json.loads(request.body.decode())
+            del labels[name]
+            labels[data['name'].lower()] = data
+            return 200, data, {}
+        if request.method == 'DELETE':
+            del labels[name]
+            return 204, None, {}
+        return 404, {'message': 'Not Found'}, {}
+
+
+class Clock:
+    """Fake time.time/time.sleep pair which does not really wait."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class StubAdapter(requests.adapters.BaseAdapter):
+    """Answer with prepared responses (status, headers) in order."""
+
+    def __init__(self, responses):
+        super().__init__()
+        self.responses = list(responses)
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        status, headers = self.responses.pop(0)
+        r = requests.Response()
+        r.status_code = status
+        r.headers.update(headers)
+        r._content = b'{}'
+        r.request = request
+        return r
+
+    def close(self):
+        pass
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    """Pass HTTP requests to FakeGitHub of the server as if they were sent
+    to GitHub API."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def handle_request(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else None
+        request = requests.Request(self.command,
+                                   'https://api.github.com' + self.path,
+                                   headers=dict(self.headers),
+                                   data=body).prepare()
+        try:
+            r = self.server.fake.send(request)
+        except requests.exceptions.ConnectionError:
+            # drop the connection without response
+            self.close_connection = True
+            return
+        self.send_response(r.status_code)
+        for header, value in r.headers.items():
+            self.send_header(header, value)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(r.content)))
+        self.end_headers()
+        self.wfile.write(r.content)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = handle_request
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeGitHubServer(ThreadingHTTPServer):
+    """Local HTTP server answering like GitHub API with fake, serving in
+    a background thread. Its base URL is in url attribute."""
+
+    daemon_threads = True
+
+    def __init__(self, fake, host='127.0.0.1', port=0):
+        super().__init__((host, port), FakeGitHubHandler)
+        self.fake = fake
+        self.url = 'http://{}:{}'.format(*self.server_address)
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class ServerAdapter(PooledAdapter):
+    """Send requests for GitHub API to server with base URL url instead,
+    over connections pooled as with real GitHub."""
+
+    def __init__(self, url, size=10):
+        self.url = url
+        super().__init__(size)
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace('https://api.github.com', self.url,
+                                          1)
+        return super().send(request, **kwargs)
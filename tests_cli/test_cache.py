@@ -0,0 +1,57 @@
+LABELS = [('label{:03}'.format(i), 'FFFFFF') for i in range(154)]
+
+
+def cache_config(tmpdir):
+    return ['[cache]', 'path = ' + str(tmpdir.join('cache', 'cache.db'))]
+
+
+def test_not_modified_labels(fake_invoker, fake_github, tmpdir):
+    fake_github.add_repo('MarekSuchanek/repo3', LABELS)
+    first = fake_invoker('list_labels', 'MarekSuchanek/repo3',
+                         extra=cache_config(tmpdir))
+    second = fake_invoker('list_labels', 'MarekSuchanek/repo3',
+                          extra=cache_config(tmpdir))
+
+    assert first.result.exit_code == second.result.exit_code == 0
+    assert second.result.output == first.result.output
+    assert len(second.result.output.split('\n')) == 155
+    assert fake_github.count('GET') == 4
+    assert fake_github.not_modified == 2
+
+
+def test_modified_labels(fake_invoker, fake_github, tmpdir):
+    fake_github.add_repo('MarekSuchanek/repo3', LABELS)
+    fake_invoker('list_labels', 'MarekSuchanek/repo3',
+                 extra=cache_config(tmpdir))
+    fake_github.add_repo('MarekSuchanek/repo3', [('bug', 'FF0000')])
+    invocation = fake_invoker('list_labels', 'MarekSuchanek/repo3',
+                              extra=cache_config(tmpdir))
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == '#FF0000 bug\n'
+    assert fake_github.not_modified == 0
+
+
+def test_not_modified_run(fake_invoker, fake_github, tmpdir):
+    for i in range(150):
+        fake_github.add_repo('MarekSuchanek/repo{}'.format(i),
+                             [('label1', 'FFAA00')])
+    for _ in range(2):
+        invocation = fake_invoker('run', 'update', '-a', '-j', '4',
+                                  labels={'label1': 'FFAA00'},
+                                  extra=cache_config(tmpdir))
+        assert invocation.result.exit_code == 0
+        assert invocation.result.output == \
+            'SUMMARY: 150 repo(s) updated successfully\n'
+
+    assert fake_github.count('GET') == 2 * (2 + 150)
+    assert fake_github.not_modified == 2 + 150
+
+
+def test_no_cache_configured(fake_invoker, fake_github, tmpdir):
+    fake_github.add_repo('MarekSuchanek/repo3', LABELS)
+    for _ in range(2):
+        fake_invoker('list_labels', 'MarekSuchanek/repo3')
+
+    assert fake_github.count('GET') == 4
+    assert fake_github.not_modified == 0
@@ -0,0 +1,58 @@
+import pytest
+import requests
+from fakegithub import FakeGitHub, FakeGitHubServer, ServerAdapter
+
+
+@pytest.fixture
+def server():
+    fake = FakeGitHub()
+    fake.add_repo('MarekSuchanek/repo', [('bug', 'FF0000')])
+    server = FakeGitHubServer(fake)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def session(server):
+    s = requests.Session()
+    s.mount('https://api.github.com', ServerAdapter(server.url))
+    return s
+
+
+URL = 'https://api.github.com/repos/MarekSuchanek/repo/labels'
+
+
+def test_labels_over_http(server, session):
+    r = session.post(URL, json={'name': 'docs', 'color': '00FF00'})
+    assert r.status_code == 201
+
+    r = session.get(URL, params={'per_page': 1})
+    assert r.status_code == 200
+    assert r.json() == [{'name': 'bug', 'color': 'FF0000'}]
+    assert r.links['next']['url'] == URL + '?per_page=1&page=2'
+
+    r = session.get(URL, params={'per_page': 1},
+                    headers={'If-None-Match': r.headers['ETag']})
+    assert r.status_code == 304
+    assert server.fake.labels('MarekSuchanek/repo') == \
+        {('bug', 'FF0000'), ('docs', '00FF00')}
+
+
+def test_rate_limit(server, session):
+    server.fake.limit(2)
+    statuses = [session.get(URL).status_code for _ in range(3)]
+    r = session.get(URL)
+
+    assert statuses == [200, 200, 403]
+    assert r.headers['X-RateLimit-Remaining'] == '0'
+    assert r.json()['message'] == 'API rate limit exceeded'
+
+
+def test_faults(server, session):
+    server.fake.fail(502)
+    server.fake.fail(None)
+
+    assert session.get(URL).status_code == 502
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session.get(URL)
+    assert session.get(URL).status_code == 200
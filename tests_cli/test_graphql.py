@@ -0,0 +1,69 @@
+from labelord.graphql import get_labels_batch
+
+LABELS = {'label1': 'FFAA00', 'label2': 'CCAAFF'}
+GRAPHQL = 'https://api.github.com/graphql'
+
+
+def graphql_requests(fake_github):
+    return [url for _, url in fake_github.requests if url == GRAPHQL]
+
+
+def test_run_graphql_reader(fake_invoker, fake_github):
+    repos = ['MarekSuchanek/repo{}'.format(i) for i in range(120)]
+    for repo in repos:
+        fake_github.add_repo(repo, [('label1', '000000'), ('old', '111111')])
+    invocation = fake_invoker('run', 'replace', '--reader', 'graphql',
+                              labels=LABELS, repos=repos)
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == \
+        'SUMMARY: 120 repo(s) updated successfully\n'
+    # 50 repositories per request, no REST reads
+    assert len(graphql_requests(fake_github)) == 3
+    assert fake_github.count('GET') == 0
+    for repo in repos:
+        assert fake_github.labels(repo) == set(LABELS.items())
+
+
+def test_run_graphql_same_as_rest(fake_invoker, fake_github):
+    repos = ['MarekSuchanek/repo1', 'MarekSuchanek/repo2']
+    big = [('label{:03}'.format(i), 'FFFFFF') for i in range(154)]
+    outputs = []
+    for reader in ['rest', 'graphql']:
+        fake_github.add_repo(repos[0], big)
+        fake_github.add_repo(repos[1], [('label1', '000000')])
+        invocation = fake_invoker('run', 'replace', '-v', '--reader', reader,
+                                  labels=LABELS, repos=repos)
+        outputs.append(sorted(invocation.result.output.split('\n')))
+
+    assert outputs[0] == outputs[1]
+
+
+def test_run_graphql_missing_repo(fake_invoker, fake_github):
+    fake_github.add_repo('MarekSuchanek/repo1')
+    invocation = fake_invoker('run', 'update', '--reader', 'graphql',
+                              labels=LABELS,
+                              repos=['MarekSuchanek/repo1',
+                                     'MarekSuchanek/missing'])
+    lines = invocation.result.output.split('\n')
+
+    assert invocation.result.exit_code == 10
+    # the missing repository is read with REST API to report the error
+    assert 'ERROR: LBL; MarekSuchanek/missing; 404 - Not Found' in lines
+    assert fake_github.count('GET') == 1
+
+
+def test_labels_batch_pages(fake_github):
+    import requests
+    s = requests.Session()
+    s.mount('https://api.github.com', fake_github)
+    big = [('label{:03}'.format(i), 'FFFFFF') for i in range(250)]
+    fake_github.add_repo('a/big', big)
+    fake_github.add_repo('a/small', [('bug', 'FF0000')])
+    labels = get_labels_batch(s, ['a/big', 'a/small', 'a/missing'], batch=2)
+
+    assert sorted(labels) == ['a/big', 'a/small']
+    assert [(l['name'], l['color']) for l in labels['a/big']] == big
+    assert labels['a/small'] == [{'name': 'bug', 'color': 'FF0000'}]
+    # two pages of a/big are read in separate requests
+    assert len(graphql_requests(fake_github)) == 4
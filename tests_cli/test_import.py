@@ -0,0 +1,30 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..')
+
+
+def test_cli_does_not_import_web():
+    code = 'import sys, labelord; labelord.cli; ' \
+           'print(sorted(m for m in ("flask", "werkzeug", "jinja2") ' \
+           'if m in sys.modules))'
+    output = subprocess.check_output(
+        [sys.executable, '-c', code], universal_newlines=True,
+        env=dict(os.environ, PYTHONPATH=ROOT))
+    assert output == '[]\n'
+
+
+def test_app_created_on_access():
+    import labelord
+    from labelord import app
+    assert labelord.app is app
+    assert '/metrics' in [rule.rule for rule in app.url_map.iter_rules()]
+
+
+def test_create_app_once():
+    import labelord
+    app = labelord.create_app()
+    assert labelord.create_app() is app is labelord.app
+    rules = {rule.rule for rule in app.url_map.iter_rules()}
+    assert {'/', '/metrics'} <= rules
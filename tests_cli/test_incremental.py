@@ -0,0 +1,99 @@
+import os
+
+LABELS = {'label1': 'FFAA00', 'label2': 'CCAAFF'}
+REPOS = ['MarekSuchanek/repo{}'.format(i) for i in range(5)]
+
+
+def setup_repos(fake_github):
+    for repo in REPOS[:3]:
+        fake_github.add_repo(repo, [('label1', 'FFAA00'),
+                                    ('label2', 'CCAAFF')])
+    for repo in REPOS[3:]:
+        fake_github.add_repo(repo, [('label1', '000000')])
+
+
+def run(fake_invoker, fake_github, *args, labels=LABELS):
+    fake_github.requests = []
+    fake_github.not_modified = 0
+    return fake_invoker('run', 'update', '--incremental', *args,
+                        labels=labels, repos=REPOS)
+
+
+def test_skip_repos_in_sync(fake_invoker, fake_github, tmpdir):
+    setup_repos(fake_github)
+    first = run(fake_invoker, fake_github, '-j', '2')
+
+    assert first.result.exit_code == 0
+    assert first.result.output == 'SUMMARY: 5 repo(s) updated successfully\n'
+    assert fake_github.count('GET') == 5
+    assert fake_github.count('PATCH') == 2
+    assert tmpdir.join('config.cfg.state').check()
+
+    # ETag of changed repositories is observed now
+    second = run(fake_invoker, fake_github)
+    assert second.result.exit_code == 0
+    assert fake_github.count('GET') == 5
+    assert fake_github.not_modified == 3
+    assert fake_github.count('PATCH') == 0
+
+    third = run(fake_invoker, fake_github, '-j', '4')
+    assert third.result.exit_code == 0
+    assert third.result.output == 'SUMMARY: 5 repo(s) updated successfully\n'
+    assert [m for m, _ in fake_github.requests] == ['GET'] * 5
+    assert fake_github.not_modified == 5
+
+
+def test_modified_labels(fake_invoker, fake_github):
+    setup_repos(fake_github)
+    for _ in range(2):
+        run(fake_invoker, fake_github)
+    fake_github.add_repo(REPOS[0], [('label1', 'FFAA00')])
+    invocation = run(fake_invoker, fake_github, '-v')
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == \
+        '[ADD][SUC] MarekSuchanek/repo0; label2; CCAAFF\n' \
+        '[SUMMARY] 5 repo(s) updated successfully\n'
+    assert fake_github.not_modified == 4
+    assert fake_github.labels(REPOS[0]) == set(LABELS.items())
+
+
+def test_changed_spec(fake_invoker, fake_github):
+    setup_repos(fake_github)
+    for _ in range(2):
+        run(fake_invoker, fake_github)
+    labels = dict(LABELS, label3='00FF00')
+    invocation = run(fake_invoker, fake_github, labels=labels)
+
+    assert invocation.result.exit_code == 0
+    assert fake_github.not_modified == 0
+    assert fake_github.count('POST') == 5
+
+    fake_invoker('run', 'replace', '--incremental', labels=labels,
+                 repos=REPOS)
+    assert fake_github.not_modified == 0
+
+
+def test_dry_run_and_errors_not_recorded(fake_invoker, fake_github):
+    setup_repos(fake_github)
+    for _ in range(2):
+        run(fake_invoker, fake_github, '--dry-run')
+        assert fake_github.not_modified == 0
+
+    run(fake_invoker, fake_github)
+    fake_github.add_repo(REPOS[4], [('label1', '000000')])
+    # the first change of the last repository fails
+    fake_github.fail(404, skip=5)
+    failed = run(fake_invoker, fake_github)
+    assert failed.result.exit_code == 10
+
+    run(fake_invoker, fake_github)
+    assert fake_github.not_modified == 4
+    assert fake_github.labels(REPOS[4]) == set(LABELS.items())
+
+
+def test_state_next_to_config(fake_invoker, fake_github, tmpdir):
+    setup_repos(fake_github)
+    fake_invoker('run', 'update', labels=LABELS, repos=REPOS)
+
+    assert not os.path.exists(str(tmpdir.join('config.cfg.state')))
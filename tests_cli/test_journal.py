@@ -0,0 +1,123 @@
+import json
+import pytest
+
+
+@pytest.fixture
+def run(fake_invoker, fake_github, repo_fleet):
+    def run_inner(*args):
+        fake_github.requests = []
+        return fake_invoker('run', 'update', '-v', *args,
+                            labels=repo_fleet.labels, repos=repo_fleet.repos)
+    return run_inner
+
+
+def test_journal_records(run, fake_github, repo_fleet, tmpdir):
+    journal = tmpdir.join('run.journal')
+    fake_github.fail(422, path='repo1/labels/label1')
+    invocation = run('--journal', str(journal))
+
+    assert invocation.result.exit_code == 10
+    records = [json.loads(l) for l in journal.readlines()]
+    assert records[0]['event'] == 'spec'
+    assert {'event': 'failed', 'repo': repo_fleet.repos[1],
+            'change': ['UPD', 'label1', 'label1', 'FFAA00']} in records
+    assert {'event': 'done', 'repo': repo_fleet.repos[1],
+            'errors': 1} in records
+    assert {'event': 'done', 'repo': repo_fleet.repos[2],
+            'errors': 0} in records
+
+
+def test_resume_retries_failed_only(run, fake_github, repo_fleet, tmpdir):
+    journal = str(tmpdir.join('run.journal'))
+    fake_github.fail(422, path='repo1/labels/label1')
+    first = run('--journal', journal)
+    assert first.result.exit_code == 10
+
+    second = run('--resume', journal)
+    assert second.result.exit_code == 0
+    assert fake_github.requests == [
+        ('PATCH', 'https://api.github.com/repos/MarekSuchanek/repo1/labels/'
+                  'label1')]
+    assert second.result.output == \
+        '[UPD][SUC] MarekSuchanek/repo1; label1; FFAA00\n' \
+        '[SUMMARY] 1 repo(s) updated successfully\n'
+    for repo in repo_fleet.repos:
+        assert fake_github.labels(repo) == set(repo_fleet.labels.items())
+
+    # everything is completed now
+    third = run('--resume', journal)
+    assert third.result.exit_code == 0
+    assert fake_github.requests == []
+
+
+def test_resume_unfinished_repo(run, fake_github, repo_fleet, tmpdir):
+    journal = tmpdir.join('run.journal')
+    first = run('--journal', str(journal))
+    assert first.result.exit_code == 0
+    # the run crashed during changes of the last repository
+    lines = journal.readlines()
+    journal.write(''.join(lines[:-1]) + '{"event": "do')
+
+    second = run('--resume', str(journal))
+    assert second.result.exit_code == 0
+    assert fake_github.count('GET') == 1
+    assert repo_fleet.repos[3] in fake_github.requests[0][1]
+    assert second.result.output == \
+        '[SUMMARY] 1 repo(s) updated successfully\n'
+
+
+def test_resume_dry_run_keeps_journal(run, fake_github, tmpdir):
+    journal = tmpdir.join('run.journal')
+    # labels are read first, then label2 is added
+    fake_github.fail(422, skip=1, path='repo1/labels')
+    run('--journal', str(journal))
+    content = journal.read()
+
+    invocation = run('--resume', str(journal), '--dry-run')
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == \
+        '[ADD][DRY] MarekSuchanek/repo1; label2; CCAAFF\n' \
+        '[SUMMARY] 1 repo(s) updated successfully\n'
+    assert fake_github.requests == []
+    assert journal.read() == content
+
+
+def test_resume_different_spec(run, fake_invoker, fake_github, repo_fleet,
+                               tmpdir):
+    journal = str(tmpdir.join('run.journal'))
+    run('--journal', journal)
+    fake_github.requests = []
+    invocation = fake_invoker('run', 'replace', '--resume', journal,
+                              labels=repo_fleet.labels, repos=repo_fleet.repos)
+
+    assert invocation.result.exit_code == 10
+    assert 'different labels specification' in invocation.result.output
+    assert fake_github.requests == []
+
+
+def test_journal_of_new_run(run, fake_invoker, fake_github, repo_fleet,
+                            tmpdir):
+    journal = str(tmpdir.join('run.journal'))
+    fake_invoker('run', 'replace', '--journal', journal,
+                 labels=repo_fleet.labels, repos=repo_fleet.repos)
+    fake_github.fail(422, path='repo2/labels')
+    run('--journal', journal)
+
+    # only the second run is resumed, including its failed repository
+    invocation = run('--resume', journal)
+    assert invocation.result.exit_code == 0
+    assert [(m, url.split('/')[5]) for m, url in fake_github.requests] == \
+        [('GET', 'repo2')]
+
+
+def test_resume_after_spec_records(run, fake_github, tmpdir):
+    journal = tmpdir.join('run.journal')
+    run('--journal', str(journal))
+    # journal appended to by older runs of another specification
+    journal.write('{"event": "spec", "fingerprint": "other"}\n'
+                  '{"event": "start", "repo": "MarekSuchanek/repo0"}\n' +
+                  journal.read(), mode='w')
+
+    invocation = run('--resume', str(journal))
+    assert invocation.result.exit_code == 0
+    assert fake_github.requests == []
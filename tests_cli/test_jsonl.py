@@ -0,0 +1,87 @@
+import io
+import json
+from labelord.helper import BufferedWriter
+
+
+def records(invocation):
+    return [json.loads(l) for l in invocation.result.output.splitlines()]
+
+
+def test_run_jsonl(fake_invoker, repo_fleet):
+    invocation = fake_invoker('run', 'update', '--output', 'jsonl', '-j', '2',
+                              labels=repo_fleet.labels, repos=repo_fleet.repos)
+    lines = records(invocation)
+    changes = [l for l in lines if l['type'] == 'change']
+
+    assert invocation.result.exit_code == 0
+    assert len(changes) == 8
+    assert {(c['action'], c['status']) for c in changes} == \
+        {('ADD', 201), ('UPD', 200)}
+    assert all(c['result'] == 'SUC' and c['elapsed'] >= 0 for c in changes)
+    assert {'type': 'change', 'action': 'UPD', 'repo': repo_fleet.repos[1],
+            'label': 'label1', 'color': 'FFAA00', 'result': 'SUC',
+            'status': 200, 'elapsed': None} in \
+        [dict(c, elapsed=None) for c in changes]
+    assert lines[-1]['type'] == 'summary'
+    assert lines[-1]['errors'] == 0
+    assert lines[-1]['repos'] == 4
+    assert lines[-1]['elapsed'] > 0
+
+
+def test_run_jsonl_errors(fake_invoker, fake_github, repo_fleet):
+    fake_github.fail(422, path='repo1/labels/')
+    invocation = fake_invoker('run', 'update', '--output', 'jsonl',
+                              labels=repo_fleet.labels,
+                              repos=repo_fleet.repos +
+                              ['MarekSuchanek/missing'])
+    lines = records(invocation)
+
+    assert invocation.result.exit_code == 10
+    assert {'type': 'change', 'action': 'UPD', 'repo': repo_fleet.repos[1],
+            'label': 'label1', 'color': 'FFAA00', 'result': 'ERR',
+            'status': 422, 'message': 'Fault'}.items() <= \
+        [l for l in lines if l.get('result') == 'ERR'][0].items()
+    assert {'type': 'error', 'action': 'LBL',
+            'repo': 'MarekSuchanek/missing', 'status': 404,
+            'message': 'Not Found'} in lines
+    assert lines[-1] == dict(lines[-1], type='summary', errors=2, repos=5)
+
+
+def test_plan_jsonl_dry(fake_invoker, repo_fleet, tmpdir):
+    invocation = fake_invoker('plan', 'update', str(tmpdir.join('plan')),
+                              '--output', 'jsonl', labels=repo_fleet.labels,
+                              repos=repo_fleet.repos[:1])
+    lines = records(invocation)
+
+    assert invocation.result.exit_code == 0
+    assert {(l['action'], l['result'], l['status']) for l in lines[:-1]} == \
+        {('ADD', 'DRY', None), ('UPD', 'DRY', None)}
+    assert lines[-1] == dict(lines[-1], changes=2, repos=1)
+
+
+def test_list_jsonl(fake_invoker, repo_fleet):
+    repos = fake_invoker('list_repos', '--output', 'jsonl')
+    labels = fake_invoker('list_labels', repo_fleet.repos[0],
+                          '--output', 'jsonl')
+    missing = fake_invoker('list_labels', 'MarekSuchanek/missing',
+                           '--output', 'jsonl')
+
+    assert records(repos) == [{'type': 'repo', 'name': r}
+                              for r in repo_fleet.repos]
+    assert records(labels) == [{'type': 'label', 'repo': repo_fleet.repos[0],
+                                'name': 'label1', 'color': '000000'}]
+    assert missing.result.exit_code == 5
+    assert records(missing) == [{'type': 'error', 'action': 'LST',
+                                 'repo': None, 'status': 404,
+                                 'message': 'Not Found'}]
+
+
+def test_buffered_writer():
+    stream = io.StringIO()
+    writer = BufferedWriter(stream, size=3)
+    for i in range(4):
+        writer.echo(str(i))
+
+    assert stream.getvalue() == '0\n1\n2\n'
+    writer.flush()
+    assert stream.getvalue() == '0\n1\n2\n3\n'
@@ -0,0 +1,53 @@
+REPOS = ['MarekSuchanek/repo{}'.format(i) for i in range(3)]
+TEMPLATE = 'MarekSuchanek/template'
+
+
+def setup_repos(fake_github):
+    fake_github.add_repo(TEMPLATE, [('bug', 'FF0000'), ('docs', '00FF00')])
+    for repo in REPOS:
+        fake_github.add_repo(repo)
+
+
+def test_template_and_listing_overlap(fake_invoker, fake_github):
+    setup_repos(fake_github)
+    fake_github.latency = 0.05
+    invocation = fake_invoker('run', 'update', '-a', '-r', TEMPLATE)
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == \
+        'SUMMARY: 4 repo(s) updated successfully\n'
+    assert fake_github.max_active == 2
+    for repo in REPOS:
+        assert fake_github.labels(repo) == fake_github.labels(TEMPLATE)
+
+
+def test_template_failure(fake_invoker, fake_github):
+    setup_repos(fake_github)
+    invocation = fake_invoker('run', 'update', '-a', '-v', '-r',
+                              'MarekSuchanek/missing')
+
+    assert invocation.result.exit_code == 10
+    assert invocation.result.output == \
+        '[LBL][ERR] MarekSuchanek/missing; 404 - Not Found\n' \
+        '[SUMMARY] 1 error(s) in total, please check log above\n'
+    assert set(fake_github.count(m) for m in ('POST', 'PATCH')) == {0}
+
+
+def test_listing_failure(fake_invoker, fake_github):
+    setup_repos(fake_github)
+    fake_github.fail(401, path='user/repos')
+    invocation = fake_invoker('plan', 'update', '-a', '-r', TEMPLATE, '-',
+                              extra=['[retry]', 'attempts = 1'])
+
+    assert invocation.result.exit_code == 10
+    assert 'ERROR: LST; 401 - Fault' in invocation.result.output
+
+
+def test_missing_spec(fake_invoker, fake_github):
+    setup_repos(fake_github)
+    no_labels = fake_invoker('run', 'update', '-a')
+    no_repos = fake_invoker('run', 'update', '-r', TEMPLATE)
+
+    assert no_labels.result.exit_code == 6
+    assert no_repos.result.exit_code == 7
+    assert fake_github.requests == []
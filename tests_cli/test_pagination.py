@@ -0,0 +1,42 @@
+import pytest
+
+
+@pytest.mark.parametrize('jobs', ['1', '4'])
+def test_list_repos_pages_in_order(fake_invoker, fake_github, jobs):
+    repos = ['MarekSuchanek/repo{:03}'.format(i) for i in range(334)]
+    for repo in repos:
+        fake_github.add_repo(repo)
+    fake_github.latency = 0.005
+    invocation = fake_invoker('list_repos', '--jobs', jobs)
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output.split('\n')[:-1] == repos
+    assert sorted(url for _, url in fake_github.requests) == [
+        'https://api.github.com/user/repos?per_page=100&page={}'.format(p)
+        for p in range(1, 5)
+    ]
+    assert (fake_github.max_active > 1) == (jobs != '1')
+
+
+def test_list_labels_concurrent_pages(fake_invoker, fake_github):
+    labels = [('label{:03}'.format(i), 'FFFFFF') for i in range(154)]
+    fake_github.add_repo('MarekSuchanek/repo3', labels)
+    invocation = fake_invoker('list_labels', 'MarekSuchanek/repo3', '-j', '2')
+    lines = invocation.result.output.split('\n')
+
+    assert invocation.result.exit_code == 0
+    assert lines[:-1] == ['#FFFFFF {}'.format(l) for l, _ in labels]
+    assert fake_github.count('GET') == 2
+
+
+def test_run_all_repos_concurrent_pages(fake_invoker, fake_github):
+    for i in range(250):
+        fake_github.add_repo('MarekSuchanek/repo{}'.format(i))
+    invocation = fake_invoker('run', 'update', '-a', '-j', '4',
+                              labels={'label1': 'FFAA00'})
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == \
+        'SUMMARY: 250 repo(s) updated successfully\n'
+    assert fake_github.count('GET') == 3 + 250
+    assert fake_github.count('POST') == 250
@@ -0,0 +1,99 @@
+import json
+import pytest
+
+LABELS = {'label1': 'FFAA00', 'label2': 'CCAAFF', 'label3': '00FF00'}
+REPOS = ['MarekSuchanek/repo{}'.format(i) for i in range(6)]
+
+
+def setup_repos(fake_github):
+    for i, repo in enumerate(REPOS):
+        fake_github.add_repo(repo, [('label1', '000000'),
+                                    ('other{}'.format(i), '111111')])
+
+
+def test_plan_reads_only(fake_invoker, fake_github, tmpdir):
+    setup_repos(fake_github)
+    planfile = str(tmpdir.join('plan.jsonl'))
+    fake_invoker('run', 'replace', labels=LABELS, repos=REPOS)
+    invocation = fake_invoker('plan', 'replace', planfile, '-j', '3',
+                              labels=LABELS, repos=REPOS)
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == \
+        'SUMMARY: 0 change(s) planned for 6 repo(s)\n'
+
+    setup_repos(fake_github)
+    fake_github.requests = []
+    invocation = fake_invoker('plan', 'replace', planfile, '-j', '3',
+                              labels=LABELS, repos=REPOS)
+    with open(planfile) as f:
+        changes = [json.loads(line) for line in f]
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == \
+        'SUMMARY: 24 change(s) planned for 6 repo(s)\n'
+    assert {m for m, _ in fake_github.requests} == {'GET'}
+    assert len(changes) == 24
+    assert ['MarekSuchanek/repo0', 'UPD', 'label1', 'label1', 'FFAA00'] in \
+        changes
+    assert ['MarekSuchanek/repo5', 'DEL', 'other5', None, '111111'] in \
+        changes
+
+
+@pytest.mark.parametrize('options', [[], ['-j', '4', '-w', '3']])
+def test_apply_same_as_run(fake_invoker, fake_github, tmpdir, options):
+    setup_repos(fake_github)
+    fake_invoker('run', 'replace', labels=LABELS, repos=REPOS)
+    expected = {repo: fake_github.labels(repo) for repo in REPOS}
+
+    setup_repos(fake_github)
+    planfile = str(tmpdir.join('plan.jsonl'))
+    fake_invoker('plan', 'replace', planfile, labels=LABELS, repos=REPOS)
+    fake_github.requests = []
+    invocation = fake_invoker('apply', planfile, '-v', *options)
+    lines = invocation.result.output.split('\n')
+
+    assert invocation.result.exit_code == 0
+    assert fake_github.count('GET') == 0
+    assert len(fake_github.requests) == 24
+    assert '[DEL][SUC] MarekSuchanek/repo3; other3; 111111' in lines
+    assert lines[-2] == '[SUMMARY] 24 change(s) applied to 6 repo(s)'
+    assert {repo: fake_github.labels(repo) for repo in REPOS} == expected
+
+
+def test_apply_order_within_repo(fake_invoker, fake_github, tmpdir):
+    planfile = tmpdir.join('plan.jsonl')
+    repo = 'MarekSuchanek/repo'
+    planfile.write('\n'.join(json.dumps(c) for c in [
+        [repo, 'DEL', 'old', None, '111111'],
+        [repo, 'UPD', 'Bug', 'bug', 'FF0000'],
+        [repo, 'ADD', None, 'new', '00FF00'],
+    ]) + '\n')
+    fake_github.add_repo(repo, [('old', '111111'), ('Bug', 'EE0000')])
+    invocation = fake_invoker('apply', str(planfile), '-w', '3', '--progress')
+
+    assert invocation.result.exit_code == 0
+    assert [m for m, _ in fake_github.requests] == ['POST', 'PATCH', 'DELETE']
+    assert fake_github.labels(repo) == {('bug', 'FF0000'), ('new', '00FF00')}
+
+
+def test_plan_and_apply_errors(fake_invoker, fake_github, tmpdir):
+    setup_repos(fake_github)
+    planfile = str(tmpdir.join('plan.jsonl'))
+    invocation = fake_invoker('plan', 'update', planfile, labels=LABELS,
+                              repos=REPOS[:2] + ['MarekSuchanek/missing'])
+    lines = invocation.result.output.split('\n')
+
+    assert invocation.result.exit_code == 10
+    assert 'ERROR: LBL; MarekSuchanek/missing; 404 - Not Found' in lines
+
+    del fake_github.repos[REPOS[1]]
+    invocation = fake_invoker('apply', planfile)
+    lines = invocation.result.output.split('\n')
+
+    assert invocation.result.exit_code == 10
+    assert 'ERROR: ADD; MarekSuchanek/repo1; label2; CCAAFF; 404 - Not Found' \
+        in lines
+    assert lines[-2] == 'SUMMARY: 3 error(s) in total, please check log above'
+    assert fake_github.labels(REPOS[0]) == \
+        set(LABELS.items()) | {('other0', '111111')}
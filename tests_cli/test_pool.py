@@ -0,0 +1,83 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from labelord.adapters import mount_pool, wrap_adapter, transport_adapter, \
+                              PooledAdapter, RetryAdapter
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'[]')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, args=(0.05,),
+                     daemon=True).start()
+    yield 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_connections_reused(server):
+    s = requests.Session()
+    adapter = mount_pool(s, 4, keepalive=30, prefix=server)
+    for _ in range(20):
+        s.get(server + '/user/repos').raise_for_status()
+
+    assert adapter.stats() == (1, 20)
+
+
+def test_pool_sized_for_concurrency(server):
+    s = requests.Session()
+    adapter = mount_pool(s, 8, prefix=server)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for r in executor.map(s.get, [server] * 200):
+            r.raise_for_status()
+    opened, sent = adapter.stats()
+
+    assert sent == 200
+    assert opened <= 8
+
+
+def test_mount_under_wrappers():
+    s = requests.Session()
+    wrapper = wrap_adapter(s, RetryAdapter)
+    adapter = mount_pool(s, 16)
+
+    assert isinstance(adapter, PooledAdapter)
+    assert transport_adapter(s) == (wrapper, adapter)
+    assert adapter.size == 16
+    # smaller pool is not needed
+    assert mount_pool(s, 4) is adapter
+    assert mount_pool(s, 32).size == 32
+
+
+def test_other_adapters_kept(fake_github):
+    s = requests.Session()
+    s.mount('https://api.github.com', fake_github)
+
+    assert mount_pool(s, 16) is fake_github
+
+
+def test_connection_stats_option(fake_invoker, fake_github):
+    fake_github.add_repo('MarekSuchanek/repo', [('bug', 'FF0000')])
+    invocation = fake_invoker('--connection-stats', 'list_labels',
+                              'MarekSuchanek/repo')
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == \
+        '#FF0000 bug\nConnections: not tracked\n'
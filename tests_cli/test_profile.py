@@ -0,0 +1,48 @@
+import json
+import pstats
+from labelord import timing
+
+
+def test_profile_breakdown(fake_invoker, repo_fleet):
+    invocation = fake_invoker('--profile', 'run', 'update', '-a', '-j', '2',
+                              labels=repo_fleet.labels)
+    lines = invocation.result.output.split('\n')
+    phases = {l.split()[0]: l.split()[1:] for l in lines[2:-1]}
+
+    assert invocation.result.exit_code == 0
+    assert lines[0] == 'SUMMARY: 4 repo(s) updated successfully'
+    assert lines[1].split() == ['phase', 'calls', 'wall', '[s]', 'cpu', '[s]']
+    assert phases['change_label'][0] == '8'
+    assert phases['change_labels'][0] == '4'
+    assert phases['diff_labels'][0] == '4'
+    assert phases['get_resource'][0] == '5'
+    assert phases['labels_spec'][0] == '1'
+    assert phases['repos_spec'][0] == '1'
+    assert len(phases['total']) == 2
+    assert timing.active is None
+
+
+def test_profile_json(fake_invoker, repo_fleet, tmpdir):
+    path = tmpdir.join('profile.json')
+    invocation = fake_invoker('--profile-json', str(path), 'run', 'update',
+                              labels=repo_fleet.labels,
+                              repos=repo_fleet.repos[:2])
+    profile = json.loads(path.read())
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == \
+        'SUMMARY: 2 repo(s) updated successfully\n'
+    assert profile['phases']['change_labels']['calls'] == 2
+    assert profile['phases']['change_labels']['wall'] <= \
+        profile['total']['wall']
+    assert set(profile['phases']['get_resource']) == {'calls', 'wall', 'cpu'}
+
+
+def test_cprofile_dump(fake_invoker, repo_fleet, tmpdir):
+    path = tmpdir.join('labelord.prof')
+    invocation = fake_invoker('--cprofile', str(path), 'list_repos')
+    stats = pstats.Stats(str(path))
+
+    assert invocation.result.exit_code == 0
+    assert any(func == 'get_resource' for _, _, func in stats.stats)
+    assert timing.active is None
@@ -0,0 +1,75 @@
+import requests
+from labelord.adapters import RateLimitAdapter, wrap_adapter
+from fakegithub import Clock, StubAdapter
+
+
+def limit(remaining, reset=1100):
+    return {'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': str(reset)}
+
+
+def make_session(responses, reserve=100):
+    clock = Clock()
+    stub = StubAdapter(responses)
+    s = requests.Session()
+    s.mount('https://api.github.com', stub)
+    wrap_adapter(s, RateLimitAdapter, reserve, 3, clock.sleep, clock.time)
+    return s, stub, clock
+
+
+def test_no_wait_with_budget():
+    s, stub, clock = make_session([(200, limit(4000))] * 3)
+    for _ in range(3):
+        s.get('https://api.github.com/user/repos')
+
+    assert clock.sleeps == []
+
+
+def test_pace_below_reserve():
+    s, stub, clock = make_session([(200, limit(10))] * 4, reserve=100)
+    for _ in range(4):
+        s.get('https://api.github.com/user/repos')
+
+    # 10 requests left for 100 seconds, about one every 10 seconds
+    assert [round(t, 1) for t in clock.sleeps] == [10.0, 11.1]
+
+
+def test_wait_for_reset_when_exhausted():
+    s, stub, clock = make_session([(200, limit(0)), (200, limit(5000, 4600))])
+    s.get('https://api.github.com/user/repos')
+    s.get('https://api.github.com/user/repos')
+
+    assert clock.sleeps == [101.0]
+
+
+def test_rejected_request_sent_again():
+    s, stub, clock = make_session([(403, limit(0)), (201, limit(4999, 4600))])
+    r = s.post('https://api.github.com/repos/a/b/labels', json={})
+
+    assert r.status_code == 201
+    assert stub.sent == 2
+    assert clock.sleeps == [101.0]
+
+
+def test_retry_after():
+    s, stub, clock = make_session([(403, {'Retry-After': '30'}),
+                                   (200, limit(4000))])
+    r = s.get('https://api.github.com/user/repos')
+
+    assert r.status_code == 200
+    assert clock.sleeps == [30]
+
+
+def test_other_forbidden_not_repeated():
+    s, stub, clock = make_session([(403, limit(4000))])
+    r = s.get('https://api.github.com/user/repos')
+
+    assert r.status_code == 403
+    assert stub.sent == 1
+
+
+def test_wrap_once():
+    s, stub, clock = make_session([])
+    adapter = s.get_adapter('https://api.github.com')
+
+    assert wrap_adapter(s, RateLimitAdapter) is adapter
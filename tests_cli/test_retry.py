@@ -0,0 +1,97 @@
+import pytest
+import requests
+from labelord.adapters import RetryAdapter, wrap_adapter
+from fakegithub import Clock, StubAdapter
+
+REPO = 'MarekSuchanek/repo1'
+RETRY = ['[retry]', 'attempts = 3', 'backoff = 0']
+
+
+def test_read_retried(fake_invoker, fake_github):
+    fake_github.add_repo(REPO, [('label1', 'FFAA00')])
+    fake_github.fail(502)
+    invocation = fake_invoker('list_labels', REPO, extra=RETRY)
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == '#FFAA00 label1\n'
+    assert fake_github.count('GET') == 2
+
+
+def test_connection_error_retried(fake_invoker, fake_github):
+    fake_github.add_repo(REPO)
+    fake_github.fail(None, times=2)
+    invocation = fake_invoker('run', 'update', '-v', labels={'bug': 'FF0000'},
+                              repos=[REPO], extra=RETRY)
+
+    assert invocation.result.exit_code == 0
+    assert '[ADD][SUC] {}; bug; FF0000'.format(REPO) in \
+        invocation.result.output
+    assert fake_github.count('GET') == 3
+
+
+@pytest.mark.parametrize('mode, labels, method, expected', [
+    ('update', {'bug': 'FF0000'}, 'POST',
+     {('label1', 'FFAA00'), ('bug', 'FF0000')}),
+    ('update', {'label1': '000000'}, 'PATCH', {('label1', '000000')}),
+    ('replace', {}, 'DELETE', set()),
+])
+def test_lost_response_of_write(fake_invoker, fake_github, mode, labels,
+                                method, expected):
+    fake_github.add_repo(REPO, [('label1', 'FFAA00')])
+    # labels are read, then the change is done but its response is lost
+    fake_github.fail(502, after=True, skip=1)
+    invocation = fake_invoker('run', mode, labels=labels, repos=[REPO],
+                              extra=RETRY)
+
+    assert invocation.result.exit_code == 0
+    assert fake_github.count(method) == 2
+    assert fake_github.labels(REPO) == expected
+
+
+def test_attempts_exhausted(fake_invoker, fake_github):
+    fake_github.add_repo(REPO)
+    fake_github.fail(503, times=3, skip=1)
+    invocation = fake_invoker('run', 'update', labels={'bug': 'FF0000'},
+                              repos=[REPO], extra=RETRY)
+
+    assert invocation.result.exit_code == 10
+    assert 'ERROR: ADD; {}; bug; FF0000; 503 - Fault'.format(REPO) in \
+        invocation.result.output
+    assert fake_github.count('POST') == 3
+
+
+def test_not_retried_without_retries(fake_invoker, fake_github):
+    fake_github.add_repo(REPO)
+    fake_github.fail(502)
+    invocation = fake_invoker('list_labels', REPO,
+                              extra=['[retry]', 'attempts = 1'])
+
+    assert invocation.result.exit_code == 10
+    assert fake_github.count('GET') == 1
+
+
+def test_backoff_and_deadline():
+    clock = Clock()
+    stub = StubAdapter([(502, {})] * 10)
+    s = requests.Session()
+    s.mount('https://api.github.com', stub)
+    wrap_adapter(s, RetryAdapter, attempts=10, backoff=1, max_backoff=4,
+                 deadline=12, sleep=clock.sleep, clock=clock.time)
+    r = s.get('https://api.github.com/user/repos')
+
+    assert r.status_code == 502
+    assert r.retries == len(clock.sleeps) == stub.sent - 1
+    assert all(0 <= t <= min(4, 2 ** i) for i, t in enumerate(clock.sleeps))
+    assert sum(clock.sleeps) <= 12
+
+
+def test_retry_after_respected():
+    clock = Clock()
+    stub = StubAdapter([(503, {'Retry-After': '5'}), (200, {})])
+    s = requests.Session()
+    s.mount('https://api.github.com', stub)
+    wrap_adapter(s, RetryAdapter, sleep=clock.sleep, clock=clock.time)
+    r = s.get('https://api.github.com/user/repos')
+
+    assert r.status_code == 200
+    assert clock.sleeps == [5]
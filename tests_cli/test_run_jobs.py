@@ -0,0 +1,78 @@
+import pytest
+
+LABELS = {'label1': 'FFAA00', 'label2': 'CCAAFF', 'label3': '00FF00'}
+REPOS = ['MarekSuchanek/repo{}'.format(i) for i in range(8)]
+
+
+def setup_repos(fake_github):
+    for i, repo in enumerate(REPOS):
+        fake_github.add_repo(repo, [('label{}'.format(i), '123456')])
+
+
+@pytest.mark.parametrize('mode', ['update', 'replace'])
+def test_jobs_same_result_as_serial(fake_invoker, fake_github, mode):
+    setup_repos(fake_github)
+    serial = fake_invoker('run', mode, '-v', labels=LABELS, repos=REPOS)
+    serial_state = {r: fake_github.labels(r) for r in REPOS}
+
+    setup_repos(fake_github)
+    parallel = fake_invoker('run', mode, '-v', '--jobs', '4',
+                            labels=LABELS, repos=REPOS)
+
+    assert parallel.result.exit_code == serial.result.exit_code == 0
+    assert sorted(parallel.result.output.split('\n')) == \
+        sorted(serial.result.output.split('\n'))
+    assert {r: fake_github.labels(r) for r in REPOS} == serial_state
+
+
+def test_jobs_output_grouped(fake_invoker, fake_github):
+    setup_repos(fake_github)
+    fake_github.latency = 0.01
+    invocation = fake_invoker('run', 'update', '-v', '-j', '8',
+                              labels=LABELS, repos=REPOS)
+    lines = invocation.result.output.split('\n')
+
+    assert invocation.result.exit_code == 0
+    assert fake_github.max_active > 1
+    # lines of each repository are printed together and in order of repos
+    repos = [l.split(';')[0].split(' ')[1] for l in lines[:-2]]
+    assert repos == sorted(repos)
+    assert lines[-2] == '[SUMMARY] 8 repo(s) updated successfully'
+
+
+def test_jobs_errors(fake_invoker, fake_github):
+    setup_repos(fake_github)
+    invocation = fake_invoker('run', 'update', '-j', '3', labels=LABELS,
+                              repos=REPOS + ['MarekSuchanek/missing'])
+    lines = invocation.result.output.split('\n')
+
+    assert invocation.result.exit_code == 10
+    assert 'ERROR: LBL; MarekSuchanek/missing; 404 - Not Found' in lines
+    assert lines[-2] == 'SUMMARY: 1 error(s) in total, please check log above'
+
+
+def test_label_jobs_onboarding(fake_invoker, fake_github):
+    labels = {'label{}'.format(i): '{:06X}'.format(i) for i in range(40)}
+    fake_github.add_repo('MarekSuchanek/new')
+    fake_github.latency = 0.005
+    invocation = fake_invoker('run', 'update', '--label-jobs', '8',
+                              labels=labels, repos=['MarekSuchanek/new'])
+
+    assert invocation.result.exit_code == 0
+    assert fake_github.count('POST') == 40
+    assert fake_github.max_active > 1
+    assert fake_github.labels('MarekSuchanek/new') == set(labels.items())
+
+
+def test_label_jobs_phases_in_order(fake_invoker, fake_github):
+    old = [('Label{}'.format(i), '000000') for i in range(10)]
+    fake_github.add_repo('MarekSuchanek/repo', old)
+    labels = {'label{}'.format(i): '111111' for i in range(5, 15)}
+    invocation = fake_invoker('run', 'replace', '-j', '2', '-w', '4',
+                              labels=labels, repos=['MarekSuchanek/repo'])
+    methods = [m for m, _ in fake_github.requests]
+
+    assert invocation.result.exit_code == 0
+    assert methods[0] == 'GET'
+    assert methods[1:] == ['POST'] * 5 + ['PATCH'] * 5 + ['DELETE'] * 5
+    assert fake_github.labels('MarekSuchanek/repo') == set(labels.items())
@@ -0,0 +1,70 @@
+import json
+from labelord.stats import endpoint, percentile
+
+
+def test_endpoint():
+    assert endpoint('https://api.github.com/user/repos?page=2') == \
+        'user/repos'
+    assert endpoint('https://api.github.com/repos/a/b/labels?page=1') == \
+        'repos/:owner/:repo/labels'
+    assert endpoint('https://api.github.com/repos/a/b/labels/bug') == \
+        'repos/:owner/:repo/labels/:name'
+    assert endpoint('https://api.github.com/graphql') == 'graphql'
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3], 95) == 3
+    assert percentile([], 50) == 0.0
+
+
+def test_stats_text(fake_invoker, fake_github, repo_fleet):
+    fake_github.limit(5000)
+    invocation = fake_invoker('--stats', 'run', 'update', '-a', '-j', '2',
+                              labels=repo_fleet.labels)
+    lines = invocation.result.output.split('\n')
+
+    assert invocation.result.exit_code == 0
+    assert lines[0] == 'SUMMARY: 4 repo(s) updated successfully'
+    assert lines[1].startswith('[STATS] 13 request(s), ')
+    assert '[STATS]      4 GET repos/:owner/:repo/labels' in lines
+    assert '[STATS]      4 PATCH repos/:owner/:repo/labels/:name' in lines
+    assert '[STATS]      1 GET user/repos' in lines
+    assert '[STATS] statuses 200 9, 201 4' in lines
+    assert '[STATS] 0 not modified (0.0% of GET), 0 retries' in lines
+    assert lines[-2] == '[STATS] rate limit remaining 4987'
+
+
+def test_stats_json(fake_invoker, repo_fleet, tmpdir):
+    path = tmpdir.join('stats.json')
+    extra = ['[cache]', 'path = ' + str(tmpdir.join('cache.db'))]
+    for _ in range(2):
+        invocation = fake_invoker('--stats-json', str(path), 'list_labels',
+                                  repo_fleet.repos[0], extra=extra)
+    stats = json.loads(path.read())
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == '#000000 label1\n'
+    assert stats['requests'] == 1
+    assert stats['not_modified'] == 1
+    assert stats['not_modified_rate'] == 1.0
+    # the second response is empty 304 filled from the cache
+    assert stats['bytes_received'] == 0
+    assert stats['statuses'] == {'304': 1}
+    assert stats['rate_limit_remaining'] is None
+    assert set(stats['latency']) == {'p50', 'p95', 'p99'}
+
+
+def test_stats_retries(fake_invoker, fake_github, repo_fleet, tmpdir):
+    path = tmpdir.join('stats.json')
+    fake_github.fail(502)
+    invocation = fake_invoker('--stats-json', str(path), 'list_labels',
+                              repo_fleet.repos[0],
+                              extra=['[retry]', 'backoff = 0'])
+    stats = json.loads(path.read())
+
+    assert invocation.result.exit_code == 0
+    assert stats['requests'] == 1
+    assert stats['retries'] == 1
@@ -0,0 +1,123 @@
+import pytest
+from labelord.cache import LabelStore
+
+LABELS = {'label1': 'FFAA00', 'label2': 'CCAAFF'}
+REPOS = ['MarekSuchanek/repo{}'.format(i) for i in range(5)]
+
+
+def store_config(tmpdir, ttl=300, size=100):
+    return ['[cache]', 'path = ' + str(tmpdir.join('cache.db')),
+            'ttl = {}'.format(ttl), 'size = {}'.format(size)]
+
+
+@pytest.fixture
+def fleet(fake_github):
+    for repo in REPOS:
+        fake_github.add_repo(repo, [('label1', '000000'), ('old', '111111')])
+
+
+def test_second_run_no_reads(fake_invoker, fake_github, fleet, tmpdir):
+    first = fake_invoker('run', 'replace', labels=LABELS, repos=REPOS,
+                         extra=store_config(tmpdir))
+    second = fake_invoker('run', 'replace', labels=LABELS, repos=REPOS,
+                          extra=store_config(tmpdir))
+
+    assert first.result.exit_code == second.result.exit_code == 0
+    # the second run sees the labels written by the first one
+    assert fake_github.count('GET') == 5
+    assert len(fake_github.requests) == 5 + 3 * 5
+    for repo in REPOS:
+        assert fake_github.labels(repo) == set(LABELS.items())
+
+
+@pytest.mark.parametrize('option', ['--refresh', '--no-cache'])
+def test_refresh_and_no_cache(fake_invoker, fake_github, fleet, tmpdir,
+                              option):
+    fake_invoker('run', 'update', labels=LABELS, repos=REPOS,
+                 extra=store_config(tmpdir))
+    fake_invoker(option, 'run', 'update', labels=LABELS, repos=REPOS,
+                 extra=store_config(tmpdir))
+
+    assert fake_github.count('GET') == 10
+
+
+def test_template_repo_read_once(fake_invoker, fake_github, fleet, tmpdir):
+    invocation = fake_invoker('run', 'update', '-r', REPOS[0],
+                              labels=LABELS, repos=REPOS,
+                              extra=store_config(tmpdir))
+
+    assert invocation.result.exit_code == 0
+    assert fake_github.count('GET') == 5
+
+
+def test_failed_write_discards(fake_invoker, fake_github, fleet, tmpdir):
+    fake_invoker('run', 'update', labels=LABELS, repos=REPOS[:1],
+                 extra=store_config(tmpdir))
+    # label changed behind our back, stored labels are stale
+    fake_github.repos[REPOS[0]].pop('old')
+    failed = fake_invoker('run', 'replace', labels=LABELS, repos=REPOS[:1],
+                          extra=store_config(tmpdir))
+    invocation = fake_invoker('run', 'update', labels=LABELS,
+                              repos=REPOS[:1], extra=store_config(tmpdir))
+
+    assert failed.result.exit_code == 10
+    assert invocation.result.exit_code == 0
+    assert fake_github.count('GET') == 2
+    assert fake_github.labels(REPOS[0]) == set(LABELS.items())
+
+
+def test_store_ttl(tmpdir, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('labelord.cache.time.time', lambda: now[0])
+    store = LabelStore(str(tmpdir.join('cache.db')), ttl=60)
+    store.set('a/b', [{'name': 'bug', 'color': 'FF0000', 'id': 1}])
+
+    assert store.get('a/b') == [{'name': 'bug', 'color': 'FF0000'}]
+    now[0] += 61
+    assert store.get('a/b') is None
+
+
+def test_store_eviction(tmpdir, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('labelord.cache.time.time', lambda: now[0])
+    store = LabelStore(str(tmpdir.join('cache.db')), ttl=60, size=2)
+    for repo in ['a/1', 'a/2', 'a/3']:
+        now[0] += 1
+        store.set(repo, [])
+        if repo == 'a/2':
+            now[0] += 1
+            store.get('a/1')
+
+    assert store.get('a/1') == []
+    assert store.get('a/2') is None
+    assert store.get('a/3') == []
+
+
+def test_store_update(tmpdir):
+    store = LabelStore(str(tmpdir.join('cache.db')), ttl=60)
+    store.set('a/b', [{'name': 'bug', 'color': 'FF0000'},
+                      {'name': 'old', 'color': '000000'}])
+    store.update('a/b', 'ADD', None, 'new', '00FF00')
+    store.update('a/b', 'UPD', 'bug', 'Bug', 'EE0000')
+    store.update('a/b', 'DEL', 'old', None, '000000')
+
+    assert store.get('a/b') == [{'name': 'new', 'color': '00FF00'},
+                                {'name': 'Bug', 'color': 'EE0000'}]
+
+
+def test_refresh_graphql_reads_once(fake_invoker, fake_github, fleet,
+                                    tmpdir):
+    fake_invoker('run', 'update', labels=LABELS, repos=REPOS,
+                 extra=store_config(tmpdir))
+    fake_github.requests = []
+    invocation = fake_invoker('--refresh', 'run', 'update', '--reader',
+                              'graphql', labels=LABELS, repos=REPOS,
+                              extra=store_config(tmpdir))
+
+    assert invocation.result.exit_code == 0
+    assert fake_github.requests == [('POST',
+                                     'https://api.github.com/graphql')]
+    # prefetched labels are stored for next runs as well
+    store = LabelStore(str(tmpdir.join('cache.db')), 300)
+    assert sorted(l['name'] for l in store.get(REPOS[0])) == \
+        sorted(LABELS) + ['old']
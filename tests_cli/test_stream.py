@@ -0,0 +1,62 @@
+import pytest
+import requests
+from labelord.cli import repos_spec
+
+LABELS = {'label1': 'FFAA00'}
+REPOS = ['MarekSuchanek/repo{:03}'.format(i) for i in range(250)]
+
+
+def setup_repos(fake_github):
+    for repo in REPOS:
+        fake_github.add_repo(repo, [('label1', '000000')])
+
+
+@pytest.mark.parametrize('jobs', ['1', '4'])
+def test_sync_while_listing(fake_invoker, fake_github, jobs):
+    setup_repos(fake_github)
+    invocation = fake_invoker('run', 'update', '-a', '-j', jobs,
+                              labels=LABELS)
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == \
+        'SUMMARY: 250 repo(s) updated successfully\n'
+    assert fake_github.count('PATCH') == 250
+
+
+def test_repos_listed_lazily(fake_github):
+    setup_repos(fake_github)
+    s = requests.Session()
+    s.mount('https://api.github.com', fake_github)
+    repos = repos_spec(s, None, True)
+
+    assert next(repos) == REPOS[0]
+    assert fake_github.count('GET') == 1
+    assert list(repos) == REPOS[1:]
+    assert fake_github.count('GET') == 3
+
+
+def test_sync_while_listing_graphql(fake_invoker, fake_github):
+    setup_repos(fake_github)
+    invocation = fake_invoker('run', 'update', '-a', '--reader', 'graphql',
+                              labels=LABELS)
+
+    assert invocation.result.exit_code == 0
+    assert invocation.result.output == \
+        'SUMMARY: 250 repo(s) updated successfully\n'
+    assert fake_github.count('GET') == 3
+    assert fake_github.count('POST') == 5
+
+
+def test_listing_failure(fake_invoker, fake_github):
+    setup_repos(fake_github)
+    # the second page of repositories fails
+    fake_github.fail(500, skip=1, path='user/repos')
+    invocation = fake_invoker('run', 'update', '-a', '-v', labels=LABELS,
+                              extra=['[retry]', 'attempts = 1'])
+    lines = invocation.result.output.split('\n')
+
+    assert invocation.result.exit_code == 10
+    assert fake_github.count('PATCH') == 100
+    assert '[LST][ERR] 500 - Fault' in lines
+    assert lines[-2] == \
+        '[SUMMARY] 1 error(s) in total, please check log above'
@@ -0,0 +1,86 @@
+def post_event(client, utils, data, signature):
+    return client.post('/', data=utils.load_data(data), headers={
+        'Content-Type': 'application/json',
+        'User-Agent': 'GitHub-Hookshot/e9907f9',
+        'X-Hub-Signature': signature,
+        'X-GitHub-Event': 'label',
+    })
+
+
+def async_config(utils, tmpdir):
+    config = tmpdir.join('config.cfg')
+    with open(utils.config('config_basic')) as f:
+        config.write(f.read() + '[webhook]\nasync = on\n')
+    return str(config)
+
+
+def test_label_created_async(client_maker, utils, tmpdir):
+    from labelord import app
+    client = client_maker(async_config(utils, tmpdir), own_config_path=True,
+                          session_expectations={
+                              'get': 0, 'post': 1, 'delete': 0, 'patch': 0
+                          })
+    result = post_event(client, utils, 'pyplayground_label_created_webhook',
+                        'sha1=5928ae03413a3b693b9cb0cbc8746921a1c55bae')
+    assert result.status == '202 ACCEPTED'
+
+    app.replication.join()
+    assert app.github_requests_total.get('MarekSuchanek/repocribro', 'POST',
+                                         422) == 1
+    app.replication.close()
+    app.replication = None
+
+
+def test_label_edited_async(client_maker, utils, tmpdir):
+    from labelord import app
+    client = client_maker(async_config(utils, tmpdir), own_config_path=True,
+                          session_expectations={
+                              'get': 0, 'post': 0, 'delete': 0, 'patch': 1
+                          })
+    result = post_event(client, utils, 'pyplayground_label_edited_webhook',
+                        'sha1=14ddf55c89d68663c4faaa2d40166fbf65147469')
+    assert result.status == '202 ACCEPTED'
+
+    app.replication.close()
+    app.replication = None
+    assert app.fanout_seconds.get() >= 1
+
+
+def test_run_server_sets_up_replication_once(invoker_norec, utils, tmpdir,
+                                             monkeypatch):
+    from labelord import app
+    from labelord.views import configurate_app
+    config = async_config(utils, tmpdir)
+    monkeypatch.setattr(app, 'run', lambda **kwargs: None)
+    monkeypatch.setattr(app, 'token', None)
+    monkeypatch.setattr(app, 'webhook_secret', None)
+    monkeypatch.setenv('LABELORD_CONFIG', config)
+    invocation = invoker_norec('--config', config, 'run_server')
+    assert invocation.result.exit_code == 0
+    worker = app.replication
+
+    # the first request does not reload the configuration
+    with app.app_context():
+        configurate_app()
+    assert app.replication is worker
+    worker.close()
+    app.replication = None
+    app.executor.shutdown()
+    app.executor = None
+
+
+def test_replication_worker_errors():
+    import logging
+    from labelord.replication import ReplicationWorker
+    replicated = []
+
+    def replicate(event):
+        if event == 'bad':
+            raise ValueError(event)
+        replicated.append(event)
+
+    worker = ReplicationWorker(replicate, logging.getLogger('test'), size=2)
+    for event in ['a', 'bad', 'b', 'c']:
+        worker.submit(event)
+    worker.close()
+    assert replicated == ['a', 'b', 'c']
@@ -0,0 +1,196 @@
+import hashlib
+import hmac
+import json
+import random
+from labelord.replication import coalesce, merge_events
+from test_fanout import GroupAdapter, app_maker, REPOS  # noqa
+
+
+def event(action, label, color='FF0000', old=None, repo=REPOS[0]):
+    return {'action': action, 'repo': repo, 'label': label, 'color': color,
+            'old': old or label}
+
+
+def test_merge_events():
+    assert merge_events(event('created', 'bug'),
+                        event('edited', 'Bug', '00FF00', 'bug')) == \
+        event('created', 'Bug', '00FF00')
+    assert merge_events(event('created', 'bug'),
+                        event('deleted', 'bug')) is None
+    assert merge_events(event('edited', 'defect', old='bug'),
+                        event('edited', 'issue', '00FF00', 'defect')) == \
+        event('edited', 'issue', '00FF00', 'bug')
+    assert merge_events(event('edited', 'defect', old='bug'),
+                        event('deleted', 'defect')) == \
+        event('deleted', 'bug')
+    assert merge_events(event('deleted', 'bug'),
+                        event('created', 'bug', '00FF00')) == \
+        event('edited', 'bug', '00FF00')
+
+
+def test_coalesce_rename_chain():
+    jobs = list(enumerate([
+        event('edited', 'defect', old='bug'),
+        event('created', 'docs'),
+        event('edited', 'Issue', old='defect'),
+        event('edited', 'Issue', '0000FF', old='issue'),
+        event('deleted', 'docs'),
+    ]))
+
+    assert coalesce(jobs) == [
+        (event('edited', 'Issue', '0000FF', 'bug'), [0, 2, 3]),
+        (None, [1, 4]),
+    ]
+
+
+def test_coalesce_other_repo():
+    jobs = list(enumerate([
+        event('edited', 'bug', '00FF00'),
+        event('edited', 'bug', '0000FF', repo=REPOS[1]),
+        event('edited', 'bug', 'FFFFFF', repo=REPOS[1]),
+    ]))
+
+    assert coalesce(jobs) == [
+        (event('edited', 'bug', '00FF00'), [0]),
+        (event('edited', 'bug', 'FFFFFF', repo=REPOS[1]), [1, 2]),
+    ]
+
+
+def test_coalesce_redelivered():
+    first = dict(event('edited', 'defect', old='bug'), redelivered=True)
+    merged, ids = coalesce([(1, first), (2, event('edited', 'issue',
+                                                    old='defect'))])[0]
+
+    assert merged == dict(event('edited', 'issue', old='bug'),
+                          redelivered=True)
+
+
+def test_coalesce_name_freed_later():
+    jobs = list(enumerate([
+        event('edited', 'defect', '00FF00'),
+        event('deleted', 'bug'),
+        event('edited', 'bug', '00FF00', 'defect'),
+    ]))
+
+    # bug exists until it is deleted, the rename cannot be replayed first
+    assert coalesce(jobs) == [
+        (event('edited', 'defect', '00FF00'), [0]),
+        (event('deleted', 'bug'), [1]),
+        (event('edited', 'bug', '00FF00', 'defect'), [2]),
+    ]
+
+
+def test_coalesce_swap():
+    jobs = list(enumerate([
+        event('edited', 'tmp', old='bug'),
+        event('edited', 'bug', old='issue'),
+        event('edited', 'issue', old='tmp'),
+    ]))
+
+    assert coalesce(jobs) == [(e, [i]) for i, e in jobs]
+
+
+def apply_event(labels, event):
+    """Change labels (dictionary of lowercase names to names and colors)
+    of a target repository by label event as GitHub does."""
+    name, old = event['label'].lower(), event['old'].lower()
+    if event['action'] == 'created' and name not in labels:
+        labels[name] = event['label'], event['color']
+    elif event['action'] == 'edited' and old in labels and \
+            (name == old or name not in labels):
+        del labels[old]
+        labels[name] = event['label'], event['color']
+    elif event['action'] == 'deleted':
+        labels.pop(name, None)
+
+
+def random_events(rng, labels, count):
+    """Return count label events of random successful changes of
+    labels."""
+    labels, events = dict(labels), []
+    while len(events) < count:
+        action = rng.choice(['created', 'edited', 'deleted'])
+        label = rng.choice(['bug', 'Bug', 'defect', 'docs', 'issue'])
+        color = rng.choice(['FF0000', '00FF00'])
+        old = rng.choice(sorted(labels) or [label])
+        if action == 'created' and label.lower() not in labels:
+            events.append(event(action, label, color))
+        elif action == 'edited' and old in labels and \
+                (label.lower() == old or label.lower() not in labels):
+            events.append(event(action, label, color, labels[old][0]))
+        elif action == 'deleted' and old in labels:
+            events.append(event(action, labels[old][0], labels[old][1]))
+        else:
+            continue
+        apply_event(labels, events[-1])
+    return events
+
+
+def test_coalesce_as_replayed_one_by_one():
+    rng = random.Random(25)
+    for _ in range(5000):
+        initial = {name: (name, 'FF0000') for name in
+                   rng.sample(['bug', 'defect', 'docs', 'issue'],
+                              rng.randint(0, 4))}
+        events = random_events(rng, initial, rng.randint(2, 8))
+        one_by_one, coalesced = dict(initial), dict(initial)
+        for e in events:
+            apply_event(one_by_one, e)
+        for e, ids in coalesce(list(enumerate(events))):
+            if e is not None:
+                apply_event(coalesced, e)
+
+        assert coalesced == one_by_one, events
+
+
+def test_durable_queue_before_coalescing(tmpdir):
+    import logging
+    from labelord.replication import ReplicationQueue
+    from labelord.replication import ReplicationWorker
+    path = str(tmpdir.join('queue.db'))
+    replicated = []
+    worker = ReplicationWorker(replicated.append, logging.getLogger('test'),
+                               jobs=ReplicationQueue(path), window=0.5)
+    worker.submit(event('edited', 'defect', old='bug'))
+    worker.submit(event('edited', 'defect', '00FF00'))
+
+    # accepted events are stored before they are coalesced
+    assert len(ReplicationQueue(path)) == 2
+    assert replicated == []
+    worker.join()
+    assert replicated == [event('edited', 'defect', '00FF00', 'bug')]
+    assert len(ReplicationQueue(path)) == 0
+    worker.close()
+
+
+def post_label_event(client, action, label, color, old=None):
+    body = {'action': action, 'repository': {'full_name': REPOS[0]},
+            'label': {'name': label, 'color': color}}
+    if old is not None:
+        body['changes'] = {'name': {'from': old}}
+    data = json.dumps(body).encode()
+    signature = hmac.new(b'S3cret!', data, hashlib.sha1).hexdigest()
+    return client.post('/', data=data, headers={
+        'Content-Type': 'application/json',
+        'X-GitHub-Event': 'label',
+        'X-Hub-Signature': 'sha1=' + signature,
+    })
+
+
+def test_coalesced_replication(app_maker):
+    adapter = GroupAdapter(latency=0)
+    app = app_maker(adapter, 4, ['async = on', 'coalesce = 60'])
+    client = app.test_client()
+    statuses = [
+        post_label_event(client, 'edited', 'defect', 'FF0000', 'bug'),
+        post_label_event(client, 'edited', 'defect', '00FF00'),
+        post_label_event(client, 'edited', 'issue', '00FF00', 'defect'),
+    ]
+    app.replication.close()
+    app.replication = None
+
+    assert [r.status_code for r in statuses] == [202] * 3
+    assert sorted(adapter.requests) == sorted(
+        ('PATCH', 'https://api.github.com/repos/{}/labels/bug'.format(r))
+        for r in REPOS[1:])
+    assert ('edited', REPOS[1], 'issue', '00FF00') in app.ignored_events
@@ -0,0 +1,85 @@
+from labelord.cache import ExpiringMultiset
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_multiset_counts_occurrences():
+    echoes = ExpiringMultiset(ttl=10, size=10, clock=Clock())
+    echoes.add(('deleted', 'repo', 'bug'))
+    echoes.add(('deleted', 'repo', 'bug'))
+
+    assert len(echoes) == 2
+    assert echoes.take(('deleted', 'repo', 'bug'))
+    assert echoes.take(('deleted', 'repo', 'bug'))
+    assert not echoes.take(('deleted', 'repo', 'bug'))
+    assert echoes.hits == 2
+    assert len(echoes) == 0
+
+
+def test_multiset_expiration():
+    clock = Clock()
+    echoes = ExpiringMultiset(ttl=10, size=10, clock=clock)
+    echoes.add('a')
+    clock.now = 5
+    echoes.add('b')
+    echoes.add('a')
+    assert echoes.take('a')
+
+    clock.now = 12
+    # the later occurrence of 'a' is left after the taken one
+    assert 'a' in echoes
+    assert echoes.expirations == 0
+    clock.now = 15
+    assert len(echoes) == 0
+    assert echoes.expirations == 2
+    assert not echoes.take('a')
+
+
+def test_multiset_eviction():
+    echoes = ExpiringMultiset(ttl=10, size=3, clock=Clock())
+    for item in 'abcde':
+        echoes.add(item)
+
+    assert len(echoes) == 3
+    assert echoes.evictions == 2
+    assert 'a' not in echoes and 'b' not in echoes
+    echoes.discard('c')
+    assert echoes.hits == 0
+    assert len(echoes) == 2
+
+
+def test_multiset_taken_entries_bounded():
+    echoes = ExpiringMultiset(ttl=10, size=5, clock=Clock())
+    for i in range(100):
+        echoes.add(i)
+        assert echoes.take(i)
+
+    assert len(echoes.order) <= 10
+    assert echoes.evictions == echoes.expirations == 0
+
+
+def test_echo_metrics(tmpdir):
+    import os
+    from labelord import app
+    config = tmpdir.join('config.cfg')
+    config.write('[github]\ntoken = thisIsNotRealToken\n'
+                 'webhook_secret = S3cret!\n[webhook]\necho_size = 1\n'
+                 '[repos]\nMarekSuchanek/repo = on\n')
+    os.environ['LABELORD_CONFIG'] = str(config)
+    app.setup_metrics()
+    app.reload_config()
+    app.ignored_events.add(('deleted', 'MarekSuchanek/repo', 'a'))
+    app.ignored_events.add(('deleted', 'MarekSuchanek/repo', 'b'))
+
+    assert app.should_ignore_event('deleted', 'MarekSuchanek/repo', 'b',
+                                   'FF0000')
+    lines = app.metrics.exposition().split('\n')
+    assert '# TYPE labelord_echo_evictions_total counter' in lines
+    assert 'labelord_echo_evictions_total 1' in lines
+    assert 'labelord_echo_expirations_total 0' in lines
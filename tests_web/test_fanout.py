@@ -0,0 +1,117 @@
+import threading
+import time
+import pytest
+import requests
+
+REPOS = ['MarekSuchanek/repo{}'.format(i) for i in range(20)]
+
+
+class GroupAdapter(requests.adapters.BaseAdapter):
+    """Answer label changes with latency, counting concurrent requests.
+    Requests to missing repositories fail with 404, to broken ones without
+    response."""
+
+    def __init__(self, missing=(), broken=(), latency=0.05):
+        super().__init__()
+        self.missing = missing
+        self.broken = broken
+        self.latency = latency
+        self.active = self.max_active = 0
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self.lock:
+            self.requests.append((request.method, request.url))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.latency)
+        with self.lock:
+            self.active -= 1
+        if any(r + '/' in request.url for r in self.broken):
+            raise requests.exceptions.ConnectionError('Broken')
+        r = requests.Response()
+        r.status_code = 404 if any(r + '/' in request.url
+                                   for r in self.missing) else 200
+        r._content = b'{}'
+        r.request = request
+        return r
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def app_maker(tmpdir, monkeypatch):
+    from labelord import app
+
+    def inner_maker(adapter, workers, webhook=()):
+        config = tmpdir.join('config.cfg')
+        config.write('\n'.join([
+            '[github]', 'token = thisIsNotRealToken',
+            'webhook_secret = S3cret!',
+            '[webhook]', 'workers = {}'.format(workers)] + list(webhook) + [
+            '[retry]', 'attempts = 1',
+            '[repos]'] + ['{} = on'.format(r) for r in REPOS]) + '\n')
+        monkeypatch.setenv('LABELORD_CONFIG', str(config))
+        session = requests.Session()
+        session.mount('https://api.github.com', adapter)
+        app.inject_session(session)
+        app.setup_metrics()
+        app.reload_config()
+        return app
+    yield inner_maker
+
+    # the app is shared by all tests
+    if app.replication is not None:
+        app.replication.close()
+        app.replication = None
+    if app.executor is not None:
+        app.executor.shutdown()
+        app.executor = None
+
+
+def edited_event(label='bug', old='Bug'):
+    return {'action': 'edited', 'repo': REPOS[0], 'label': label,
+            'color': 'FF0000', 'old': old}
+
+
+def test_concurrent_fanout(app_maker):
+    adapter = GroupAdapter()
+    app = app_maker(adapter, 8)
+    start = time.perf_counter()
+    failures = app.replicate(edited_event())
+
+    assert failures == []
+    assert time.perf_counter() - start < 19 * adapter.latency / 2
+    assert 1 < adapter.max_active <= 8
+    assert sorted(adapter.requests) == sorted(
+        ('PATCH', 'https://api.github.com/repos/{}/labels/Bug'.format(r))
+        for r in REPOS[1:])
+    assert sum(('edited', r, 'bug', 'FF0000') in app.ignored_events
+               for r in REPOS) == 19
+
+
+def test_fanout_failures(app_maker):
+    adapter = GroupAdapter(missing=[REPOS[3]], broken=[REPOS[7]])
+    app = app_maker(adapter, 4)
+    app.ignored_events.clear()
+    failures = app.replicate(edited_event('Ext', 'ext'))
+
+    assert failures == [(REPOS[3], 404), (REPOS[7], None)]
+    assert app.replication_failures_total.get(REPOS[3], 'edited') == 1
+    assert app.github_requests_total.get(REPOS[7], 'PATCH', 'error') == 1
+    # no echo comes from repositories where the change failed
+    assert len(app.ignored_events) == 17
+    assert ('edited', REPOS[3], 'Ext', 'FF0000') not in app.ignored_events
+
+
+def test_sequential_fanout(app_maker):
+    adapter = GroupAdapter(latency=0)
+    app = app_maker(adapter, 1)
+    app.replicate({'action': 'created', 'repo': REPOS[0], 'label': 'bug',
+                   'color': 'FF0000', 'old': 'bug'})
+
+    assert app.executor is None
+    assert adapter.max_active == 1
+    assert [m for m, _ in adapter.requests] == ['POST'] * 19
@@ -0,0 +1,58 @@
+def post_event(client, utils, data, signature, event='label'):
+    return client.post('/', data=utils.load_data(data), headers={
+        'Content-Type': 'application/json',
+        'User-Agent': 'GitHub-Hookshot/e9907f9',
+        'X-Hub-Signature': signature,
+        'X-GitHub-Event': event,
+    })
+
+
+def test_metrics(client_maker, utils):
+    from labelord import app
+    app.setup_metrics()
+    client = client_maker('config_basic', session_expectations={
+        'get': 0, 'post': 1, 'delete': 0, 'patch': 0
+    })
+    post_event(client, utils, 'pyplayground_ping_webhook',
+               'sha1=b7a7bacc401abde76ef575b2f3f436ae28aad8ec', 'ping')
+    post_event(client, utils, 'pyplayground_label_created_webhook',
+               'sha1=5928ae03413a3b693b9cb0cbc8746921a1c55bae')
+    post_event(client, utils, 'pyplayground_label_created_webhook',
+               'sha1=b7a7bacc401abde7aaaaabb2f3f436ae28aad8ec')
+
+    result = client.get('/metrics')
+    lines = result.get_data(as_text=True).split('\n')
+
+    assert result.status == '200 OK'
+    assert result.headers['Content-Type'].startswith('text/plain')
+    assert '# TYPE labelord_webhook_events_total counter' in lines
+    assert 'labelord_webhook_events_total{event="ping",action=""} 1' in lines
+    assert 'labelord_webhook_events_total{event="label",action="created"} 1' \
+        in lines
+    assert 'labelord_webhook_signature_failures_total 1' in lines
+    assert 'labelord_github_requests_total{repo="MarekSuchanek/repocribro",' \
+        'method="POST",status="422"} 1' in lines
+    assert 'labelord_fanout_duration_seconds_count 1' in lines
+    assert 'labelord_webhook_duration_seconds_count{status="200"} 2' in lines
+    assert 'labelord_webhook_duration_seconds_bucket{status="401",' \
+        'le="+Inf"} 1' in lines
+
+
+def test_histogram_buckets():
+    from labelord.metrics import Registry
+    registry = Registry()
+    histogram = registry.histogram('latency', 'Latency.', ('path',),
+                                   buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, '/')
+
+    assert registry.exposition().split('\n') == [
+        '# HELP latency Latency.',
+        '# TYPE latency histogram',
+        'latency_bucket{path="/",le="0.1"} 1',
+        'latency_bucket{path="/",le="1"} 2',
+        'latency_bucket{path="/",le="+Inf"} 3',
+        'latency_sum{path="/"} 5.55',
+        'latency_count{path="/"} 3',
+        '',
+    ]
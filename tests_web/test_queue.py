@@ -0,0 +1,74 @@
+import threading
+from labelord.replication import ReplicationQueue
+from test_fanout import GroupAdapter, app_maker, REPOS  # noqa
+
+
+def deleted_event(label):
+    return {'action': 'deleted', 'repo': REPOS[0], 'label': label,
+            'color': 'FF0000', 'old': label}
+
+
+def test_queue_redelivers_unacknowledged(tmpdir):
+    path = str(tmpdir.join('queue.db'))
+    jobs = ReplicationQueue(path, batch=2)
+    for i in range(5):
+        jobs.put(deleted_event('label{}'.format(i)))
+    for i in range(3):
+        job, event = jobs.get()
+        assert event == deleted_event('label{}'.format(i))
+        if i != 1:
+            jobs.ack(job)
+    assert len(jobs) == 3
+    jobs.close()
+    assert jobs.get() is None
+
+    # the process is restarted
+    jobs = ReplicationQueue(path)
+    jobs.put(deleted_event('new'))
+    events = [jobs.get()[1] for _ in range(4)]
+    assert [e['label'] for e in events] == ['label1', 'label3', 'label4',
+                                            'new']
+    assert [e.get('redelivered', False) for e in events] == \
+        [True, True, True, False]
+
+
+def test_queue_join(tmpdir):
+    jobs = ReplicationQueue(str(tmpdir.join('queue.db')))
+    done = []
+
+    def consume():
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            done.append(job[1]['label'])
+            jobs.ack(job[0])
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    for i in range(300):
+        jobs.put(deleted_event('label{}'.format(i)))
+    jobs.join()
+    jobs.close()
+    consumer.join()
+    assert done == ['label{}'.format(i) for i in range(300)]
+    assert len(jobs) == 0
+
+
+def test_pending_events_replicated_at_start(app_maker, tmpdir):
+    path = str(tmpdir.join('queue.db'))
+    jobs = ReplicationQueue(path)
+    # the label was deleted in some repositories before the restart
+    jobs.put(deleted_event('bug'))
+    adapter = GroupAdapter(missing=REPOS[1:10], latency=0)
+    app = app_maker(adapter, 4, ['async = on', 'queue_path = ' + path])
+    app.replication.join()
+    app.replication.close()
+    app.replication = None
+
+    assert len(ReplicationQueue(path)) == 0
+    assert sorted(adapter.requests) == sorted(
+        ('DELETE', 'https://api.github.com/repos/{}/labels/bug'.format(r))
+        for r in REPOS[1:])
+    assert all(app.replication_failures_total.get(r, 'deleted') == 0
+               for r in REPOS)